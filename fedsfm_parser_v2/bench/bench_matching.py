@@ -0,0 +1,190 @@
+"""
+Бенчмарк сравнения RFM ↔ Airtable на синтетических данных (bench/synth.py).
+
+Для каждого масштаба (строк РФМ = записей Airtable) в отдельном процессе —
+чтобы пиковая память считалась для одного масштаба:
+    match_quality       пар/с на случайной выборке пар
+    find_best_match     строк/с и кандидатов на строку (выборка строк РФМ)
+    compare_all_mapped  время, пар/с, кандидатов на строку, precision/recall
+                        «full»-совпадений по заложенному эталону
+    peak_rss_mb         пиковая память процесса
+
+Каждый масштаб — отдельный процесс со своим временным каталогом данных
+(FEDSFM_WORK_DIR): рабочие кэши (region_scores.npz, кэш пар) не читаются
+и не перезаписываются.
+
+    $ python bench/bench_matching.py                        # 1k и 10k
+    $ python bench/bench_matching.py --scales 1k,10k,100k,1M --workers 4
+    $ python bench/bench_matching.py --out results/matching_v2.json
+
+Результат — JSON (по умолчанию bench/results/matching_<время>.json):
+параметры запуска, версия сравнения и по записи на масштаб.
+"""
+
+from __future__ import annotations
+
+import argparse, json, logging, os, platform, random, resource, shutil, subprocess, sys, tempfile, time
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = BENCH_DIR / "results"
+sys.path.insert(0, str(BENCH_DIR))
+
+QUALITY_PAIRS = 20_000
+FIND_ROWS = 2_000
+
+
+def parse_scale(text: str) -> int:
+    text = text.strip().lower()
+    mult = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * mult)
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux — КБ, macOS — байты
+    return round(rss / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+class _NullQueue:
+    """Вместо TelegramQueue: уведомления только считаются."""
+
+    def __init__(self):
+        self.sent = 0
+
+    def send_message(self, *args, **kwargs):
+        self.sent += 1
+
+
+def _rate(count: int, seconds: float) -> float:
+    return round(count / seconds, 1) if seconds > 0 else None
+
+
+def bench_scale(n: int, seed: int, workers: int) -> dict:
+    # config читает FEDSFM_WORK_DIR при импорте — только в процессе масштаба
+    import synth      # добавляет src в sys.path
+    from compare_airtable import MatchIndex, compare_all_mapped, find_best_match, match_quality, matcher_version
+
+    result = {"scale": n, "seed": seed, "workers": workers, "matcher_version": matcher_version()}
+
+    t = time.perf_counter()
+    people = synth.persons(n, seed)
+    rfm_df = synth.rfm_frame(synth.rfm_lines(people, seed))
+    air_df, truth = synth.airtable_frame(people, n, seed)
+    result["generate_s"] = round(time.perf_counter() - t, 3)
+    result["planted_pairs"] = len(truth)
+    # эталон: (ID строки РФМ, _air_id)
+    expected = {(rfm_df["ID"].iat[key], air_id) for air_id, key in truth.items()}
+
+    t = time.perf_counter()
+    index = MatchIndex(air_df)
+    result["index_build_s"] = round(time.perf_counter() - t, 3)
+
+    # match_quality: половина пар — заложенные, половина — случайные
+    rng = random.Random(seed)
+    rfm_rows = rfm_df.to_dict("records")
+    air_rows = air_df.to_dict("records")
+    air_by_id = {row["_air_id"]: row for row in air_rows}
+    planted = list(truth.items())
+    pairs = []
+    for k in range(min(QUALITY_PAIRS, n * 2)):
+        if k % 2 and planted:
+            air_id, key = rng.choice(planted)
+            pairs.append((rfm_rows[key], air_by_id[air_id]))
+        else:
+            pairs.append((rng.choice(rfm_rows), rng.choice(air_rows)))
+    t = time.perf_counter()
+    for rfm_row, air_row in pairs:
+        match_quality(rfm_row, air_row)
+    seconds = time.perf_counter() - t
+    result["match_quality"] = {"pairs": len(pairs), "seconds": round(seconds, 3),
+                               "pairs_per_s": _rate(len(pairs), seconds)}
+
+    # find_best_match по выборке строк РФМ
+    sample = rng.sample(rfm_rows, min(FIND_ROWS, len(rfm_rows)))
+    index.pairs_scored = index.rows_blocked = 0
+    t = time.perf_counter()
+    for row in sample:
+        find_best_match(row, air_df, index=index)
+    seconds = time.perf_counter() - t
+    result["find_best_match"] = {
+        "rows": len(sample), "seconds": round(seconds, 3), "rows_per_s": _rate(len(sample), seconds),
+        "pairs_scored": index.pairs_scored,
+        "candidates_per_row": round(index.pairs_scored / max(1, index.rows_blocked), 2),
+        "pairs_per_s": _rate(index.pairs_scored, seconds),
+    }
+
+    # полное сравнение
+    index.pairs_scored = index.rows_blocked = 0
+    queue = _NullQueue()
+    t = time.perf_counter()
+    matches = compare_all_mapped(rfm_df, air_df, [], tq=queue, index=index, workers=workers)
+    seconds = time.perf_counter() - t
+    found = {(m["ID"], m["_air_id"]) for m in matches}
+    hits = len(found & expected)
+    result["compare_all_mapped"] = {
+        "rows": len(rfm_df), "seconds": round(seconds, 3), "rows_per_s": _rate(len(rfm_df), seconds),
+        "pairs_scored": index.pairs_scored,
+        "candidates_per_row": round(index.pairs_scored / max(1, index.rows_blocked), 2),
+        "pairs_per_s": _rate(index.pairs_scored, seconds),
+        "matches": len(found),
+        "precision": round(hits / len(found), 4) if found else None,
+        "recall": round(hits / len(expected), 4) if expected else None,
+    }
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Matching benchmark on synthetic RFM/Airtable data")
+    parser.add_argument("--scales", default="1k,10k", help="масштабы через запятую: 1k,10k,100k,1M")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1, help="процессов для compare_all_mapped")
+    parser.add_argument("--out", type=Path, help="JSON с результатами")
+    parser.add_argument("--one", type=int, help=argparse.SUPPRESS)   # один масштаб в этом процессе
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    if args.one is not None:
+        print(json.dumps(bench_scale(args.one, args.seed, args.workers)))
+        return
+
+    report = {
+        "benchmark": "matching",
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "matcher_version": None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [],
+    }
+    for scale in map(parse_scale, args.scales.split(",")):
+        work_dir = Path(tempfile.mkdtemp(prefix="fedsfm_bench_"))
+        try:
+            proc = subprocess.run(
+                [sys.executable, __file__, "--one", str(scale), "--seed", str(args.seed), "--workers", str(args.workers)],
+                capture_output=True, text=True, env={**os.environ, "FEDSFM_WORK_DIR": str(work_dir)},
+            )
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        if proc.returncode:
+            sys.stderr.write(proc.stderr)
+            report["results"].append({"scale": scale, "error": proc.stderr.strip().splitlines()[-1:]})
+            continue
+        row = json.loads(proc.stdout.strip().splitlines()[-1])
+        report["matcher_version"] = row.pop("matcher_version")
+        report["results"].append(row)
+        full = row["compare_all_mapped"]
+        print(f"{scale:>9}: quality {row['match_quality']['pairs_per_s']} pairs/s | "
+              f"find {row['find_best_match']['rows_per_s']} rows/s | "
+              f"all {full['seconds']}s, {full['candidates_per_row']} cand/row, "
+              f"P {full['precision']} R {full['recall']} | {row['peak_rss_mb']} MB")
+
+    out = args.out or RESULTS_DIR / f"matching_{datetime.now():%Y_%m_%d__%H_%M_%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding="utf-8")
+    print(out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Бенчмарк конвейера без сети и без Airtable: разбор, загрузка страницы,
+diff, мастер-список, снимки. Данные — bench/synth.py (по seed).
+
+    parse_person_text   _parse_person_text по N строкам
+    parse_batch         rfm_parser.parse_batch по тем же строкам
+    fetch_cold          fetch_rfm_list с локального HTTP-сервера (фикстура
+                        страницы), без кэша разбора
+    fetch_cached        то же с кэшем разбора (ParseCache) прошлой загрузки
+    diff                compare.diff двух снимков, изменено --change-rate строк
+    diff_files          compare.diff_files по тем же снимкам (CSV, по ID)
+    master_cold         update_master при журнале за --history-days дней
+                        без текущего состояния (догоняет весь журнал)
+    master_warm         update_master при готовом текущем состоянии
+    snapshot_csv        save_dataset + load_latest, CSV
+    snapshot_parquet    то же, Parquet (если есть pyarrow)
+
+Для каждого случая — лучшее время из --repeat запусков, пик и остаток
+выделенной памяти по tracemalloc (отдельный запуск) и пиковая память
+процесса. Каждый масштаб — отдельный процесс со своим временным каталогом
+данных (FEDSFM_WORK_DIR), рабочие data/ и reports/ не затрагиваются.
+
+    $ python bench/bench_pipeline.py                          # 1k и 10k
+    $ python bench/bench_pipeline.py --scales 10k,100k --repeat 5
+    $ python bench/bench_pipeline.py --save-baseline          # запомнить как эталон
+    $ python bench/bench_pipeline.py --baseline other.json --threshold 0.2
+
+Сравнение с эталоном (по умолчанию bench/baseline_pipeline.json): время или
+пик памяти больше эталонного более чем на threshold (и больше шума:
+50 мс / 1 МБ) — регрессия, код выхода 1. Эталон имеет смысл только для той же машины.
+"""
+
+from __future__ import annotations
+
+import argparse, json, os, platform, random, resource, shutil, subprocess, sys, tempfile, threading, time, tracemalloc
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pandas as pd
+
+BENCH_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = BENCH_DIR / "results"
+BASELINE_FILE = BENCH_DIR / "baseline_pipeline.json"
+sys.path.insert(0, str(BENCH_DIR))
+
+# сравниваемые с эталоном метрики и разница, которая считается шумом
+METRICS = {"seconds": 0.05, "alloc_peak_mb": 1.0}
+
+
+def parse_scale(text: str) -> int:
+    text = text.strip().lower()
+    mult = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * mult)
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+def measure(run, setup=None, repeat: int = 3) -> dict:
+    """
+    run(*setup()) — лучшее и среднее время из `repeat` запусков, затем ещё
+    один запуск под tracemalloc (он заметно медленнее — время не искажает).
+    """
+    times = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        t = time.perf_counter()
+        run(*args)
+        times.append(time.perf_counter() - t)
+    args = setup() if setup else ()
+    tracemalloc.start()
+    try:
+        run(*args)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "seconds": round(min(times), 4),
+        "mean_seconds": round(sum(times) / len(times), 4),
+        "alloc_peak_mb": round(peak / (1 << 20), 2),
+        "alloc_retained_mb": round(retained / (1 << 20), 2),
+    }
+
+
+# ---------- фикстура страницы РФМ ----------
+def serve_page() -> ThreadingHTTPServer:
+    """Локальный сервер страницы РФМ; содержимое — server.page (bytes)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = self.server.page
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.page = b""
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ---------- данные ----------
+def changed_snapshot(df, rate: float, rng: random.Random, extra):
+    """Копия снимка: удалено, добавлено (из `extra`) и изменено по rate·N строк."""
+    k = max(1, int(len(df) * rate))
+    new = df.drop(index=rng.sample(range(len(df)), k)).reset_index(drop=True)
+    changed = rng.sample(range(len(new)), min(k, len(new)))
+    new.loc[changed, "Остальные данные"] = new.loc[changed, "Остальные данные"] + ", ИЗМ."
+    return pd.concat([new, extra.iloc[:k]], ignore_index=True)
+
+
+def write_history(events_file: Path, rows: list, n: int, days: int, rng: random.Random):
+    """
+    Журнал мастер-списка за `days` дней: в начале n человек, затем каждый
+    день добавляется и удаляется около 0.1% списка. → ID в списке на конец.
+    """
+    churn = max(1, n // 1000)
+    start = datetime(2020, 1, 1)
+    active = {}
+    fresh = iter(rows)
+    lines = []
+
+    def add(row, day):
+        active[row["ID"]] = row
+        lines.append(json.dumps({"date": f"{day:%Y-%m-%d}", "op": "added", "ID": row["ID"], "row": row},
+                                ensure_ascii=False))
+
+    for _ in range(n):
+        add(next(fresh), start)
+    for d in range(1, days):
+        day = start + timedelta(days=d)
+        for id_ in rng.sample(sorted(active), min(churn, len(active))):
+            del active[id_]
+            lines.append(json.dumps({"date": f"{day:%Y-%m-%d}", "op": "removed", "ID": id_}))
+        for _ in range(churn):
+            row = next(fresh, None)
+            if row is not None:
+                add(row, day)
+    events_file.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return list(active.values())
+
+
+# ---------- один масштаб ----------
+def bench_scale(n: int, seed: int, repeat: int, change_rate: float, history_days: int) -> dict:
+    # адрес сервера — до первого импорта config (PARSE_URL берётся из окружения)
+    server = serve_page()
+    os.environ["RFM_PARSE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/"
+    import synth
+    lines = synth.rfm_lines(synth.persons(n, seed), seed)
+    server.page = synth.page_html(lines).encode("utf-8")
+
+    from compare import diff, diff_files, sort_snapshot
+    from config import DATA_DIR, MASTER_EVENTS_FILE, MASTER_VIEW_FILE, PARSE_CACHE_FILE
+    from master_log import MasterLog
+    from rfm_parser import _parse_person_text, fetch_rfm_list, parse_batch
+    from storage import load_latest, save_dataset, update_master
+
+    rng = random.Random(seed)
+    cases = {}
+
+    cases["parse_person_text"] = measure(lambda: [_parse_person_text(line) for line in lines], repeat=repeat)
+    cases["parse_batch"] = measure(lambda: parse_batch(lines), repeat=repeat)
+
+    def no_cache():
+        PARSE_CACHE_FILE.unlink(missing_ok=True)
+        return ()
+    cases["fetch_cold"] = measure(lambda: fetch_rfm_list(use_cache=False), no_cache, repeat)
+
+    fetch_rfm_list(use_cache=True)      # кэш разбора для следующего случая
+    cases["fetch_cached"] = measure(lambda: fetch_rfm_list(use_cache=True), repeat=repeat)
+    server.shutdown()
+
+    # diff двух снимков
+    old_df = synth.rfm_frame(lines)
+    extra_people = synth.persons(max(1, int(n * change_rate)), seed + 100)
+    extra_df = synth.rfm_frame(synth.rfm_lines(extra_people, seed + 100))
+    new_df = changed_snapshot(old_df, change_rate, rng, extra_df)
+    cases["diff"] = measure(lambda: diff(old_df, new_df), repeat=repeat)
+
+    old_csv, new_csv = DATA_DIR / "bench_old.csv", DATA_DIR / "bench_new.csv"
+    old_df.to_csv(old_csv, index=False)
+    new_df.to_csv(new_csv, index=False)
+    sort_snapshot(old_csv, old_csv)
+    sort_snapshot(new_csv, new_csv)
+    cases["diff_files"] = measure(lambda: list(diff_files(old_csv, new_csv)), repeat=repeat)
+
+    # мастер-список с историей
+    history_people = synth.persons(n + max(1, n // 1000) * history_days, seed + 200)
+    history_rows = synth.rfm_frame(synth.rfm_lines(history_people, seed + 200)).fillna("").astype(str)
+    events = DATA_DIR / "bench_master_events.jsonl"
+    active = write_history(events, history_rows.to_dict("records"), n, history_days, rng)
+    today = pd.DataFrame(active[: len(active) - max(1, n // 1000)])
+    ts = datetime(2020, 1, 1) + timedelta(days=history_days)
+
+    def master(view: bool):
+        shutil.copyfile(events, MASTER_EVENTS_FILE)
+        MASTER_VIEW_FILE.unlink(missing_ok=True)
+        if view:
+            MasterLog().current()
+        return ()
+    cases["master_cold"] = measure(lambda: update_master(today, ts), lambda: master(False), repeat)
+    cases["master_warm"] = measure(lambda: update_master(today, ts), lambda: master(True), repeat)
+
+    # снимки
+    clock = iter(datetime(2030, 1, 1) + timedelta(seconds=s) for s in range(10 ** 6))
+    formats = ["csv"]
+    try:
+        import pyarrow  # noqa: F401
+        formats.append("parquet")
+    except ImportError:
+        pass
+    for fmt in formats:
+        def round_trip(fmt=fmt):
+            save_dataset(old_df, next(clock), prefix="bench", fmt=fmt)
+            load_latest(prefix="bench")
+        cases[f"snapshot_{fmt}"] = measure(round_trip, repeat=repeat)
+
+    return {"scale": n, "seed": seed, "change_rate": change_rate, "history_days": history_days,
+            "cases": cases, "peak_rss_mb": peak_rss_mb()}
+
+
+# ---------- эталон ----------
+def find_regressions(results: list, baseline: dict, threshold: float) -> list:
+    base = {r["scale"]: r.get("cases", {}) for r in baseline.get("results", [])}
+    found = []
+    for row in results:
+        for case, values in row.get("cases", {}).items():
+            ref = base.get(row["scale"], {}).get(case)
+            if not ref:
+                continue
+            for metric, noise in METRICS.items():
+                if ref.get(metric) and values[metric] > max(ref[metric] * (1 + threshold), ref[metric] + noise):
+                    found.append({"scale": row["scale"], "case": case, "metric": metric,
+                                  "baseline": ref[metric], "current": values[metric],
+                                  "ratio": round(values[metric] / ref[metric], 2)})
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmark of parsing, diff, master list and snapshots")
+    parser.add_argument("--scales", default="1k,10k", help="строк РФМ через запятую: 1k,10k,100k")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--change-rate", type=float, default=0.01, help="доля удалённых/добавленных/изменённых строк")
+    parser.add_argument("--history-days", type=int, default=3 * 365)
+    parser.add_argument("--out", type=Path, help="JSON с результатами")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--threshold", type=float, default=0.25, help="допустимый рост времени/памяти (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="сохранить результаты как эталон")
+    parser.add_argument("--one", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one is not None:
+        import logging
+        logging.basicConfig(level=logging.WARNING, format="%(message)s")
+        print(json.dumps(bench_scale(args.one, args.seed, args.repeat, args.change_rate, args.history_days)))
+        return
+
+    report = {
+        "benchmark": "pipeline",
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [],
+    }
+    for scale in map(parse_scale, args.scales.split(",")):
+        work_dir = Path(tempfile.mkdtemp(prefix="fedsfm_bench_"))
+        try:
+            proc = subprocess.run(
+                [sys.executable, __file__, "--one", str(scale), "--seed", str(args.seed),
+                 "--repeat", str(args.repeat), "--change-rate", str(args.change_rate),
+                 "--history-days", str(args.history_days)],
+                capture_output=True, text=True, env={**os.environ, "FEDSFM_WORK_DIR": str(work_dir)},
+            )
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        if proc.returncode:
+            sys.stderr.write(proc.stderr)
+            report["results"].append({"scale": scale, "error": proc.stderr.strip().splitlines()[-1:]})
+            continue
+        row = json.loads(proc.stdout.strip().splitlines()[-1])
+        report["results"].append(row)
+        print(f"scale {scale} (peak RSS {row['peak_rss_mb']} MB)")
+        for case, values in row["cases"].items():
+            print(f"  {case:<18} {values['seconds']:>9.4f}s  alloc peak {values['alloc_peak_mb']:>8.2f} MB"
+                  f"  retained {values['alloc_retained_mb']:>7.2f} MB")
+
+    if args.baseline.exists() and not args.save_baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        report["baseline"] = str(args.baseline)
+        report["regressions"] = find_regressions(report["results"], baseline, args.threshold)
+        for r in report["regressions"]:
+            print(f"REGRESSION {r['case']} @ {r['scale']}: {r['metric']} {r['baseline']} → {r['current']} (×{r['ratio']})")
+        if not report["regressions"]:
+            print(f"No regressions against {args.baseline} (threshold {args.threshold:.0%})")
+
+    out = args.out or RESULTS_DIR / f"pipeline_{datetime.now():%Y_%m_%d__%H_%M_%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding="utf-8")
+    print(out)
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding="utf-8")
+        print(f"Baseline saved: {args.baseline}")
+    sys.exit(1 if report.get("regressions") else 0)
+
+
+if __name__ == "__main__":
+    main()
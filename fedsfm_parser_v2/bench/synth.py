@@ -0,0 +1,230 @@
+"""
+Сидированный генератор синтетических данных для бенчмарков:
+строки РФМ-списка (как <li> на странице), записи Airtable и страница РФМ.
+
+    persons(n, seed)               — люди: ФИО, пол, ДР, регион из regions_dict.csv
+    rfm_line(person, num, rng)     — строка РФМ: «N. ФИО*, (псевдоним), ДД.ММ.ГГГГ г.р. , регион;»
+    rfm_frame(lines)               — DataFrame секции russianFL тем же путём, что в main
+    airtable_frame(...)            — записи Airtable: часть — те же люди с шумом
+                                     (опечатки, Ё/Е, форматы ДР, другой регион),
+                                     остальное — посторонние и однофамильцы
+    page_html(lines)               — страница РФМ для fetch_rfm_list
+
+Всё определяется seed: одинаковый seed — одинаковые данные в любой версии.
+"""
+
+from __future__ import annotations
+
+import random, sys
+from datetime import date, timedelta
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+import pandas as pd
+
+from regions import read_region_dict
+
+SURNAMES = [
+    "ИВАНОВ", "ПЕТРОВ", "СИДОРОВ", "КУЗНЕЦОВ", "СМИРНОВ", "ПОПОВ", "ВАСИЛЬЕВ", "СОКОЛОВ",
+    "МИХАЙЛОВ", "НОВИКОВ", "ФЕДОРОВ", "МОРОЗОВ", "ВОЛКОВ", "АЛЕКСЕЕВ", "ЛЕБЕДЕВ", "СЕМЕНОВ",
+    "ЕГОРОВ", "ПАВЛОВ", "КОЗЛОВ", "СТЕПАНОВ", "НИКОЛАЕВ", "ОРЛОВ", "АНДРЕЕВ", "МАКАРОВ",
+    "НИКИТИН", "ЗАХАРОВ", "ЗАЙЦЕВ", "СОЛОВЬЕВ", "БОРИСОВ", "ЯКОВЛЕВ", "ГРИГОРЬЕВ", "РОМАНОВ",
+    "ВОРОБЬЕВ", "СЕРГЕЕВ", "КОВАЛЕВ", "ФРОЛОВ", "ЖУКОВ", "ЁЛКИН", "ЩЕРБАКОВ", "ЦВЕТКОВ",
+    "МАГОМЕДОВ", "АЛИЕВ", "ГАДЖИЕВ", "АБДУЛАЕВ", "ИСМАИЛОВ", "ХАСАНОВ", "ОМАРОВ", "РАСУЛОВ",
+    "КАРИМОВ", "ГУСЕЙНОВ", "ЮСУПОВ", "САИДОВ", "ИБРАГИМОВ", "МУРТАЗАЛИЕВ", "ДАУДОВ", "ХАЛИДОВ",
+]
+FIRST_MALE = [
+    "ИВАН", "АЛЕКСАНДР", "СЕРГЕЙ", "ДМИТРИЙ", "АНДРЕЙ", "АЛЕКСЕЙ", "МАКСИМ", "ЕВГЕНИЙ",
+    "ВЛАДИМИР", "НИКОЛАЙ", "ПАВЕЛ", "ЮРИЙ", "ВИКТОР", "ОЛЕГ", "АРТЕМ", "ФЁДОР", "ИЛЬЯ",
+    "МАГОМЕД", "РУСЛАН", "АХМЕД", "ЗАУР", "ШАМИЛЬ", "РАМАЗАН", "ТИМУР", "САИД", "ИСЛАМ",
+]
+FIRST_FEMALE = [
+    "ОЛЬГА", "ЕЛЕНА", "ТАТЬЯНА", "НАТАЛЬЯ", "ИРИНА", "СВЕТЛАНА", "МАРИЯ", "АННА",
+    "ЮЛИЯ", "ЕКАТЕРИНА", "АЛЁНА", "ПАТИМАТ", "ЗАРЕМА", "АМИНА", "МАДИНА", "ФАТИМА",
+]
+PATRONYMIC_BASE = [
+    "ИВАН", "АЛЕКСАНДР", "СЕРГЕ", "ВЛАДИМИР", "НИКОЛА", "ПЕТР", "ВИКТОР", "ЮРЬ",
+    "МАГОМЕД", "РУСЛАН", "АХМЕД", "ШАМИЛ", "ТИМУР", "РАСУЛ", "АЛИ",
+]
+DOCUMENT_TAILS = ["", "", "", ", ПАСПОРТ 82 05 123456", ", ИНН 054100000000", ", ПРОЖ. ТАМ ЖЕ"]
+PLACE_PREFIXES = ["", "Г. ", "С. ", "П. ", "УРОЖ. Г. "]
+
+_RUS_LETTERS = "АБВГДЕЖЗИКЛМНОПРСТУФХЦЧШЩЫЭЮЯ"
+
+
+class Person:
+    __slots__ = ("key", "surname", "name", "patronymic", "female", "dob", "region_id",
+                 "place", "alias", "terrorist")
+
+    @property
+    def fio(self) -> str:
+        return " ".join(p for p in (self.surname, self.name, self.patronymic) if p)
+
+
+def _patronymic(rng: random.Random, female: bool) -> str:
+    base = rng.choice(PATRONYMIC_BASE)
+    if base in ("МАГОМЕД", "АХМЕД", "ТИМУР", "АЛИ", "РАСУЛ") and rng.random() < .3:
+        return base + (" КЫЗЫ" if female else " ОГЛЫ")
+    soft = base.endswith(("Ь", "Й")) or base in ("СЕРГЕ", "НИКОЛА", "ЮРЬ")
+    if female:
+        return base + ("ЕВНА" if soft else "ОВНА")
+    return base + ("ЕВИЧ" if soft else "ОВИЧ")
+
+
+def _female_surname(surname: str) -> str:
+    return surname + "А" if surname.endswith(("ОВ", "ЕВ", "ИН", "ЁВ")) else surname
+
+
+def persons(n: int, seed: int = 0, regions: dict = None) -> list:
+    rng = random.Random(seed)
+    regions = regions or read_region_dict()
+    region_ids = list(regions)
+    start = date(1950, 1, 1).toordinal()
+    result = []
+    for k in range(n):
+        p = Person()
+        p.key = k
+        p.female = rng.random() < .2
+        surname = rng.choice(SURNAMES)
+        p.surname = _female_surname(surname) if p.female else surname
+        p.name = rng.choice(FIRST_FEMALE if p.female else FIRST_MALE)
+        p.patronymic = _patronymic(rng, p.female) if rng.random() < .95 else ""
+        p.dob = date.fromordinal(start + rng.randrange(365 * 55))
+        p.region_id = rng.choice(region_ids)
+        name, variants = regions[p.region_id]
+        p.place = rng.choice(variants or [name.upper()])
+        p.alias = None
+        if rng.random() < .15:
+            # псевдоним — прежняя фамилия или другое имя
+            p.alias = f"{rng.choice(SURNAMES)} {p.name}" if rng.random() < .6 else f"{p.surname} {rng.choice(FIRST_MALE)}"
+        p.terrorist = rng.random() < .5
+        result.append(p)
+    return result
+
+
+def rfm_line(p: Person, num: int, rng: random.Random) -> str:
+    """Строка <li> РФМ-списка (как на странице, до нормализации пробелов)."""
+    line = f"{num}. {p.fio}{'*' if p.terrorist else ''},"
+    if p.alias:
+        line += f" ({p.alias}),"
+    if rng.random() < .97:
+        line += f" {p.dob:%d.%m.%Y} г.р. ,"
+    line += f" {rng.choice(PLACE_PREFIXES)}{p.place}{rng.choice(DOCUMENT_TAILS)};"
+    return line
+
+
+def rfm_lines(people, seed: int = 0) -> list:
+    rng = random.Random(seed + 1)
+    return [rfm_line(p, num, rng) for num, p in enumerate(people, 1)]
+
+
+def rfm_frame(lines) -> pd.DataFrame:
+    """DataFrame секции russianFL из строк — разбор и производные колонки как в fetch_rfm_sections."""
+    from rfm_parser import RFM_SECTION_ID, SECTIONS, iter_section_rows
+    section = SECTIONS[RFM_SECTION_ID]
+    df = pd.DataFrame(iter_section_rows(section, lines), columns=section.columns)
+    for column, derive in section.derived.items():
+        df[column] = derive(df)
+    return df
+
+
+# ---------- шум для записей Airtable ----------
+def _typo(word: str, rng: random.Random) -> str:
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    kind = rng.random()
+    if kind < .4:       # замена
+        return word[:i] + rng.choice(_RUS_LETTERS) + word[i + 1:]
+    if kind < .7:       # пропуск
+        return word[:i] + word[i + 1:]
+    return word[:i - 1] + word[i] + word[i - 1] + word[i + 1:]     # перестановка
+
+
+def _yo(word: str) -> str:
+    return word.replace("Ё", "Е") if "Ё" in word else word.replace("Е", "Ё", 1)
+
+
+def _air_dob(p: Person, rng: random.Random):
+    r = rng.random()
+    if r < .05:
+        return float("nan")
+    if r < .08:
+        return str(p.dob.year)                              # только год
+    if r < .13:
+        return f"{p.dob:%d.%m.%Y}"
+    if r < .15:
+        return f"{p.dob + timedelta(days=1):%Y-%m-%d}"      # ошибка ввода
+    return f"{p.dob:%Y-%m-%d}"
+
+
+def _air_record(p: Person, air_id: str, rng: random.Random, region_ids: list, noisy: bool) -> dict:
+    surname, name, patronymic = p.surname, p.name, p.patronymic
+    if noisy:
+        if rng.random() < .12:
+            surname = _typo(surname, rng)
+        if rng.random() < .05:
+            name = _typo(name, rng)
+        if rng.random() < .08:
+            surname, name = _yo(surname), _yo(name)
+        if p.alias and rng.random() < .3:
+            surname, name = p.alias.split(" ", 1)[0], p.alias.split(" ", 1)[-1]
+    region = [p.region_id] if not noisy or rng.random() < .88 else [rng.choice(region_ids)]
+    return {
+        "Name": " ".join(x for x in (surname, name, patronymic) if x),
+        "✦ Фамилия": surname,
+        "✦Имя": name,
+        "✦Отчество": patronymic or float("nan"),
+        "✦Дата рождения": _air_dob(p, rng) if noisy else f"{p.dob:%Y-%m-%d}",
+        "✦Регион, где возбудили УД/задержали": str(region) if not noisy or rng.random() < .95 else float("nan"),
+        "✦Росфинмониторинг": str(p.terrorist) if rng.random() < .9 else float("nan"),
+        "Manual sort": 0,
+        "_air_id": air_id,
+    }
+
+
+def airtable_frame(people, n_air: int, seed: int = 0, planted_share: float = .3,
+                   regions: dict = None):
+    """
+    → (DataFrame записей Airtable в случайном порядке, {_air_id: ключ человека РФМ}).
+    planted_share записей — люди из `people` с шумом (это и есть эталон),
+    остальные — посторонние, из них часть — однофамильцы людей РФМ с другой ДР.
+    """
+    rng = random.Random(seed + 2)
+    regions = regions or read_region_dict()
+    region_ids = list(regions)
+    n_planted = min(len(people), int(n_air * planted_share))
+    planted = rng.sample(people, n_planted)
+    others = persons(n_air - n_planted, seed + 3, regions)
+
+    records, truth = [], {}
+    for k, p in enumerate(planted):
+        air_id = f"recP{k:07d}"
+        records.append(_air_record(p, air_id, rng, region_ids, noisy=True))
+        truth[air_id] = p.key
+    for k, p in enumerate(others):
+        if people and rng.random() < .1:
+            # однофамилец: те же ФИО, другая ДР
+            twin = rng.choice(people)
+            p.surname, p.name, p.patronymic = twin.surname, twin.name, twin.patronymic
+        records.append(_air_record(p, f"recO{k:07d}", rng, region_ids, noisy=False))
+    rng.shuffle(records)
+    for pos, rec in enumerate(records):
+        rec["Manual sort"] = pos
+    return pd.DataFrame(records), truth
+
+
+def page_html(lines, section_id: str = "russianFL") -> str:
+    """Страница РФМ с одной секцией — фикстура для fetch_rfm_list."""
+    items = "".join(f"<li>{line}\n</li>" for line in lines)
+    return (
+        "<html><head><meta charset='utf-8'></head><body>"
+        + "<div class='menu'>меню</div>" * 200
+        + f'<div id="{section_id}"><ol class="terrorist-list">{items}</ol></div>'
+        + '<div id="foreignFL"><ol><li>1. JOHN DOE, 01.01.1970 г.р.</li></ol></div>'
+        + "<p>подвал</p>" * 2000
+        + "</body></html>"
+    )
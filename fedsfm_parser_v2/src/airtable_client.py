@@ -1,4 +1,4 @@
-import logging, time
+import io, logging, time
 from typing import List, Dict
 
 import pandas as pd
@@ -10,6 +10,7 @@ from config import (
     AIRTABLE_CACHE_DIR,
     AIRTABLE_FIELDS_MAIN,
 )
+from manifest import Manifest
 
 API_BASE = "https://api.airtable.com/v0"
 
@@ -81,7 +82,13 @@ class AirtableClient:
         df = df[[c for c in fields if c in df.columns] + ["_air_id"]]
 
         cache = AIRTABLE_CACHE_DIR / (cache_name or f"{table}.csv")
-        df.to_csv(cache, index=False, encoding="utf-8")
-        
+        csv_text = df.to_csv(index=False)
+        cache.write_text(csv_text, encoding="utf-8")
+        Manifest().register(cache, rows=len(df))
+
+        # возвращаем ровно то, что дал бы pd.read_csv(cache, dtype=str):
+        # списки id строкой "['rec…']", пустые ячейки — NaN, но без чтения с диска
+        df = pd.read_csv(io.StringIO(csv_text), dtype=str)
+
         logging.info("Airtable: итог %d строк, %d колонок", len(df), len(df.columns) - 1)
         return df, cache
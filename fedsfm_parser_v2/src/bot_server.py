@@ -51,7 +51,7 @@ def handle_choice(update: Update, ctx: CallbackContext):
     ctx.user_data["await_choice"] = False
 
     # запускаем в отдельном потоке, чтобы бот не завис
-    threading.Thread(target=run_parser, kwargs={"compare_all": compare_all}, daemon=True).start()
+    threading.Thread(target=run_parser, kwargs={"compare_all": compare_all, "force": True}, daemon=True).start()
 
 # ---------- main loop --------------------------------------------------
 def main():
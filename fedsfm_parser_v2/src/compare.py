@@ -1,28 +1,134 @@
-import pandas as pd, logging
-from typing import List, Tuple
-
-def diff(old_df: pd.DataFrame, new_df: pd.DataFrame) -> Tuple[List[dict], List[dict], List[tuple]]:
-    old_ids = set(old_df["ID"])
-    new_ids = set(new_df["ID"])
-
-    added_ids = new_ids - old_ids
-    removed_ids = old_ids - new_ids
-    common_ids = old_ids & new_ids
-
-    added = [r.to_dict() for _, r in new_df[new_df["ID"].isin(added_ids)].iterrows()]
-    removed = [r.to_dict() for _, r in old_df[old_df["ID"].isin(removed_ids)].iterrows()]
-
-    old_dict = old_df.set_index('ID').to_dict(orient='index')
-    new_dict = new_df.set_index('ID').to_dict(orient='index')
-
-    changed = []
-    for id_ in common_ids:
-        old_row = old_dict.get(id_)
-        # old_row = old_df[old_df["ID"] == id_].iloc[0]
-        new_row = new_dict.get(id_)
-        # new_row = new_df[new_df["ID"] == id_].iloc[0]
-        cols = ["Остальные данные", "Доп Имя", "Террорист"]
-        if any(str(old_row.get(c)) != str(new_row.get(c)) for c in cols):
-            changed.append((old_row, new_row))
+import csv, heapq, logging, os, tempfile
+import pandas as pd
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+DIFF_COLUMNS = ["Остальные данные", "Доп Имя", "Террорист"]
+
+def row_hashes(df: pd.DataFrame, columns: List[str]) -> pd.Series:
+    """
+    64-битный хэш содержимого каждой строки по колонкам `columns`.
+    Значения сравниваются как строки (str()), как и раньше: True == "True".
+    """
+    return pd.util.hash_pandas_object(df.reindex(columns=columns).astype(str), index=False)
+
+def diff(old_df: pd.DataFrame, new_df: pd.DataFrame, columns: List[str] = None) -> Tuple[List[dict], List[dict], List[tuple]]:
+    """
+    :param columns:  колонки, изменение которых считается «обновлением»
+                     (по умолчанию DIFF_COLUMNS; для других секций — RfmSection.compare_columns)
+
+    Строки сопоставляются по ID, изменения ищутся сравнением хэшей строк,
+    словари строятся только для добавленных/удалённых/изменённых записей.
+    changed — пары (old, new) без ключа «ID», в порядке new_df.
+    """
+    cols = columns or DIFF_COLUMNS
+
+    in_old = new_df["ID"].isin(old_df["ID"]).to_numpy()
+    in_new = old_df["ID"].isin(new_df["ID"]).to_numpy()
+
+    added = new_df[~in_old].to_dict(orient="records")
+    removed = old_df[~in_new].to_dict(orient="records")
+
+    old_common = old_df[in_new]
+    new_common = new_df[in_old]
+
+    old_hash = pd.Series(row_hashes(old_common, cols).to_numpy(), index=old_common["ID"].to_numpy())
+    old_hash = old_hash[~old_hash.index.duplicated(keep="last")]
+    new_hash = row_hashes(new_common, cols).to_numpy()
+    mask = old_hash.reindex(new_common["ID"].to_numpy()).to_numpy() != new_hash
+
+    changed_new = new_common[mask]
+    changed_old = (
+        old_common.drop_duplicates("ID", keep="last")
+        .set_index("ID")
+        .loc[changed_new["ID"]]
+    )
+    changed = list(zip(
+        changed_old.to_dict(orient="records"),
+        changed_new.drop(columns="ID").to_dict(orient="records"),
+    ))
     logging.info("Added %d, Removed %d, Changed %d", len(added), len(removed), len(changed))
-    return added, removed, changed
\ No newline at end of file
+    return added, removed, changed
+
+# ─────────────────────────────────────────────────────────────────────────────
+def _iter_sorted_rows(path) -> Iterator[dict]:
+    """
+    Строки CSV-снимка по одной; проверяет, что ID строго возрастают.
+    """
+    prev = None
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            id_ = row["ID"]
+            if prev is not None and id_ <= prev:
+                raise ValueError(f"{path}: снимок не отсортирован по ID ({prev!r} → {id_!r}), см. sort_snapshot()")
+            prev = id_
+            yield row
+
+
+def diff_files(old_path, new_path, columns: List[str] = None) -> Iterator[Tuple[str, object]]:
+    """
+    Потоковый diff двух CSV-снимков, отсортированных по ID (merge-join).
+    Память не зависит от размера файлов — в каждый момент открыто по
+    одной строке с каждой стороны.
+
+    Генерирует события:
+        ("added",   new_row)
+        ("removed", old_row)
+        ("changed", (old_row, new_row))   — без ключа «ID», как в diff()
+    Значения читаются строками, поэтому сравнение совпадает с diff().
+    """
+    cols = columns or DIFF_COLUMNS
+    old_rows = _iter_sorted_rows(old_path)
+    new_rows = _iter_sorted_rows(new_path)
+    old = next(old_rows, None)
+    new = next(new_rows, None)
+
+    while old is not None or new is not None:
+        if new is None or (old is not None and old["ID"] < new["ID"]):
+            yield "removed", old
+            old = next(old_rows, None)
+        elif old is None or new["ID"] < old["ID"]:
+            yield "added", new
+            new = next(new_rows, None)
+        else:
+            if any(old.get(c) != new.get(c) for c in cols):
+                old.pop("ID")
+                new.pop("ID")
+                yield "changed", (old, new)
+            old = next(old_rows, None)
+            new = next(new_rows, None)
+
+
+def sort_snapshot(path, out_path, chunk_rows: int = 100_000) -> Path:
+    """
+    Внешняя сортировка CSV-снимка по ID для diff_files(): файл читается
+    кусками по `chunk_rows` строк, куски сортируются и сливаются через heapq.
+    """
+    out_path = Path(out_path)
+    tmp_dir = tempfile.mkdtemp(prefix="rfm_sort_", dir=out_path.parent)
+    runs = []
+    try:
+        header = None
+        for i, chunk in enumerate(pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_rows)):
+            header = list(chunk.columns)
+            run = Path(tmp_dir) / f"run_{i}.csv"
+            chunk.sort_values("ID", kind="stable").to_csv(run, index=False, encoding="utf-8")
+            runs.append(run)
+        if header is None:
+            header = list(pd.read_csv(path, nrows=0).columns)
+
+        files = [open(run, encoding="utf-8", newline="") for run in runs]
+        try:
+            readers = [csv.DictReader(f) for f in files]
+            with open(out_path, "w", encoding="utf-8", newline="") as out:
+                writer = csv.DictWriter(out, fieldnames=header, lineterminator="\n")
+                writer.writeheader()
+                writer.writerows(heapq.merge(*readers, key=lambda r: r["ID"]))
+        finally:
+            for f in files:
+                f.close()
+    finally:
+        for run in runs:
+            run.unlink(missing_ok=True)
+        os.rmdir(tmp_dir)
+    return out_path
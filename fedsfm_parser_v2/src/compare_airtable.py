@@ -1,18 +1,24 @@
-import ast
+import ast, hashlib, multiprocessing, re
 from collections import defaultdict
-from datetime import datetime
-import logging, re, unicodedata, pandas as pd
+from datetime import date, datetime
+import logging, math, numpy as np, pandas as pd
 from rapidfuzz import fuzz, process
 from typing import Literal, Tuple, List, Dict
 
 from modules.telegram_queue import TelegramQueue
 from notify_tools import is_terrorist, notify
+from regions import REGION_IDS_COLUMN, get_gazetteer, get_region_scorer, parse_region_ids
 from storage import get_region_dict
+from utils import normalize_text as _norm
 
 MatchType = Literal["full", "partial", "none"]
+# менять при любом изменении логики сравнения — сбрасывает кэш пар (match_cache)
+# и таблицу совпадений (match_table)
+MATCHER_VERSION = "2"
 region_dict = get_region_dict()
 
 missed_regions = set()
+unparsed_dobs = set()       # даты рождения, которые не удалось разобрать
 
 # ─────────────────────────────────────────────────────────────────────────────
 def _parse_id_list(id_string: str) -> List[str]:
@@ -27,19 +33,6 @@ def _parse_id_list(id_string: str) -> List[str]:
         print(f"Error parsing id list: {e}")
     return []
 
-def _norm(text: str) -> str:
-    """
-    Приводим строку к верхнему регистру + убираем диакритику и лишние пробелы.
-    """
-    if not isinstance(text, str):
-        return ""
-    text = unicodedata.normalize("NFD", text)
-    text = "".join(ch for ch in text if not unicodedata.combining(ch))
-    text = re.sub(r"[^\w\s]", " ", text, flags=re.U)
-    text = re.sub(r"\s+", " ", text).strip().upper()
-    return text
-
-
 def _fio_tokens(row: dict) -> List[str]:
     """
     Возвращает токены ФИО (без порядок значения).
@@ -90,36 +83,87 @@ def _region(row: dict) -> str:
     return res
 
 
-def match_quality(rfm_row: dict, air_row: dict) -> Tuple[MatchType, int]:
+def _air_region_ids(row: dict) -> set | None:
     """
-    Возвращает тип совпадения и числовой «вес» (для выбора лучшего).
-    full      – 3 из 3: ДР, ФИО, регион
-    partial   – 2 из 3
-    none      – 1 / 0 из 3
+    ID регионов строки Airtable, которые есть в справочнике
+    (отсутствующие попадают в missed_regions); None — у строки нет поля региона.
     """
-    # FIO
-    score_fio = fuzz.token_set_ratio(" ".join(_fio_tokens(air_row)),
-                                     " ".join(_fio_tokens(rfm_row) ))
-    ok_fio  = score_fio >= 85
+    if "✦Регион, где возбудили УД/задержали" not in row:
+        return None
+    ids = set()
+    for reg_id in _parse_id_list(row.get("✦Регион, где возбудили УД/задержали")):
+        if reg_id in region_dict:
+            ids.add(reg_id)
+        elif reg_id not in missed_regions:
+            logging.warning(f"REGION IS MISSED IN THE DICTIONATY: {reg_id}")
+            missed_regions.add(reg_id)
+    return ids
+
+
+def _rfm_region_ids(row: dict) -> set:
+    """
+    ID регионов из «Остальных данных» строки РФМ: посчитанные при разборе
+    (REGION_IDS_COLUMN) или, для старых снимков без этой колонки, — сейчас.
+    """
+    ids = parse_region_ids(row.get(REGION_IDS_COLUMN))
+    if ids is None:
+        ids = get_gazetteer().extract(row.get("Остальные данные", ""))
+    return ids
 
-    # DOB
-    air_dob = _get_possible_nan_val(air_row, "✦Дата рождения")
-    rfm_dob = _get_possible_nan_val(rfm_row, "Дата рождения")
-    ok_dob  = normalize_and_compare_dobs(air_dob, rfm_dob)
 
-    # REGION
+def _region_score_slow(rfm_row: dict, air_row: dict) -> float:
     air_region = _region(air_row)
     rfm_region = _region(rfm_row)
 
     score_region = 0
-    region_best_tuple = (None, None)
-
     if len(air_region) > 0 and len(rfm_region) > 0:
         for check_region in air_region:
             ratio = fuzz.token_set_ratio(rfm_region[0], check_region)
             if ratio > score_region:
                 score_region = ratio
-                region_best_tuple = (rfm_region[0], check_region)
+    return score_region
+
+
+def match_quality(rfm_row: dict, air_row: dict, stats: dict = None) -> Tuple[MatchType, int]:
+    """
+    Возвращает тип совпадения и числовой «вес» (для выбора лучшего).
+    full      – 3 из 3: ДР, ФИО, регион
+    partial   – 2 из 3
+    none      – 1 / 0 из 3
+    Проверки — от дешёвых к дорогим (score_features_cascade): для «none»
+    вес — нижняя оценка. Для многих сравнений выгоднее один раз подготовить
+    строки (MatchIndex).
+    :param stats:  счётчики по этапам (CASCADE_STAGES)
+    """
+    return score_features_cascade(MatchFeatures.from_row(rfm_row, "rfm"), MatchFeatures.from_row(air_row, "air"),
+                                  stats)
+
+
+def _region_score(rfm: "MatchFeatures", air: "MatchFeatures") -> float:
+    if air.region_ids is None or rfm.region_field:
+        # нестандартные строки — прежнее попарное сравнение строк
+        return _region_score_slow(rfm.row, air.row)
+    if air.region_ids & rfm.text_region_ids:
+        # регион из справочника целиком найден в тексте РФМ — token_set_ratio
+        # дал бы ровно 100, нечёткое сравнение не нужно
+        return 100
+    if not air.region_ids or not rfm.other:
+        return 0
+    # похожесть текста на каждый регион посчитана один раз на текст
+    return get_region_scorer().score(rfm.other, air.region_ids)
+
+
+def score_features(rfm: "MatchFeatures", air: "MatchFeatures") -> Tuple[MatchType, int]:
+    """match_quality по заранее подготовленным признакам строк."""
+    # FIO
+    score_fio = fuzz.token_set_ratio(air.fio, rfm.fio)
+    ok_fio  = score_fio >= 85
+
+    # DOB
+    ok_dob  = air.dob > 0 and air.dob == rfm.dob
+
+    # REGION
+    score_region = _region_score(rfm, air)
 
     ok_region  = score_region >= 85
 
@@ -134,101 +178,631 @@ def match_quality(rfm_row: dict, air_row: dict) -> Tuple[MatchType, int]:
     return "none", total_score
 
 
+CASCADE_STAGES = ("pairs", "pruned_dob", "pruned_region", "pruned_fio", "partial", "full")
+
+
+def score_features_cascade(rfm: "MatchFeatures", air: "MatchFeatures", stats: dict = None,
+                           full_only: bool = False) -> Tuple[MatchType, int]:
+    """
+    score_features с ранним выходом: ДР (сравнение чисел) → регион
+    (пересечение ID, затем таблица похожести) → ФИО (нечётко, с порогом).
+    Нечёткое сравнение ФИО — только если исход от него ещё зависит.
+    Для «partial»/«full» тип и score те же, что у score_features; для «none»
+    тип тот же, а score — нижняя оценка (без несчитанного ФИО).
+    :param stats:      счётчики по этапам (CASCADE_STAGES)
+    :param full_only:  нужен только «full» (find_best_match/compare_all) —
+                       пары, которые не могут стать «full», сразу «none»
+    """
+    if stats is not None:
+        stats["pairs"] += 1
+    ok_dob = air.dob > 0 and air.dob == rfm.dob
+    if full_only and not ok_dob:
+        if stats is not None:
+            stats["pruned_dob"] += 1
+        return "none", 0
+    score_region = _region_score(rfm, air)
+    ok_region = score_region >= 85
+
+    passed = ok_dob + ok_region
+    if passed < (2 if full_only else 1):
+        # даже совпавшее ФИО не даст нужного числа совпадений
+        if stats is not None:
+            stats["pruned_region"] += 1
+        return "none", score_region + (100 if ok_dob else 0)
+
+    # если без ФИО «none», точный score ниже порога не нужен
+    need_cutoff = passed == 1 or full_only
+    score_fio = fuzz.token_set_ratio(air.fio, rfm.fio, score_cutoff=85 if need_cutoff else None)
+    ok_fio = score_fio >= 85
+    if need_cutoff and not ok_fio:
+        if stats is not None:
+            stats["pruned_fio"] += 1
+        return "none", score_region + (100 if ok_dob else 0)
+
+    mtype = "full" if passed + ok_fio == 3 else "partial"
+    if stats is not None:
+        stats[mtype] += 1
+    # порядок сложения как в score_features — score совпадает до бита
+    return mtype, score_fio * 2 + score_region + (100 if ok_dob else 0)
+
+
 def normalize_and_compare_dobs(date1: str, date2: str) -> bool:
-    formats = ["%Y-%m-%d", "%d.%m.%Y"]
+    d1 = parse_dob(date1)
+    return d1 > 0 and d1 == parse_dob(date2)
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Дата рождения → целое число:
+#   > 0  номер дня (date.toordinal()) — полная дата
+#   < 0  минус год — известен только год ("1965")
+#   0    даты нет или формат не распознан (значение попадает в unparsed_dobs)
+# Совпадение ДР — равенство положительных чисел; дата из одного года
+# совпадением не считается (как и раньше, когда она не разбиралась).
+_DOB_FORMATS = ["%Y-%m-%d", "%d.%m.%Y"]
+# частые форматы — векторно через pandas, остальное — через parse_dob
+_DOB_FAST = [(re.compile(r"^\d{4}-\d\d-\d\d$"), "%Y-%m-%d"), (re.compile(r"^\d\d\.\d\d\.\d{4}$"), "%d.%m.%Y")]
+_YEAR_RE = re.compile(r"^(\d{4})(?:\s*г\.?)?$")
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_dob_memo = {}
+
+
+def parse_dob(value) -> int:
+    """Дата рождения → число (см. выше); каждое значение разбирается один раз."""
+    if not isinstance(value, str):
+        return 0
+    result = _dob_memo.get(value)
+    if result is None:
+        result = _dob_memo[value] = _parse_dob(value.strip())
+    return result
+
+
+def _parse_dob(value: str) -> int:
+    if len(value) <= 2:         # пусто, "-"
+        return 0
+    for fmt in _DOB_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date().toordinal()
+        except ValueError:
+            continue
+    m = _YEAR_RE.match(value)
+    if m:
+        return -int(m.group(1))
+    unparsed_dobs.add(value)
+    return 0
+
+
+def dob_ordinals(values: pd.Series) -> np.ndarray:
+    """parse_dob для колонки: уникальные значения частых форматов — одним pd.to_datetime."""
+    codes, uniques = pd.factorize(values)
+    result = np.zeros(len(uniques), dtype=np.int64)
+    texts = pd.Series([v.strip() if isinstance(v, str) else "" for v in uniques], dtype=object)
+    rest = np.ones(len(uniques), dtype=bool)
+    for pattern, fmt in _DOB_FAST:
+        mask = texts.str.match(pattern).to_numpy(dtype=bool)
+        if not mask.any():
+            continue
+        parsed = pd.to_datetime(texts[mask], format=fmt, errors="coerce")
+        ok = parsed.notna().to_numpy()
+        days = parsed[ok].to_numpy().astype("datetime64[D]").astype(np.int64)
+        idx = np.flatnonzero(mask)[ok]
+        result[idx] = days + _EPOCH_ORDINAL
+        rest[idx] = False       # NaT (31.02.1965 и т.п.) — через parse_dob
+    for i in np.flatnonzero(rest):
+        result[i] = parse_dob(uniques[i])
+    # -1 — NaN в колонке
+    return np.where(codes >= 0, result[codes], 0)
+
+
+def _dob_column(df: pd.DataFrame, column: str) -> np.ndarray:
+    if column not in df.columns:
+        return np.zeros(len(df), dtype=np.int64)
+    return dob_ordinals(df[column])
+
+
+class MatchFeatures:
+    """
+    Нормализованные признаки строки РФМ или Airtable для match_quality —
+    считаются один раз на строку, а не на каждую пару.
+    """
+
+    __slots__ = ("row", "pos", "fio", "tokens", "dob", "region_ids", "text_region_ids",
+                 "region_field", "other", "terrorist", "_key")
+
+    @classmethod
+    def from_row(cls, row: dict, side: str, dob: int = None) -> "MatchFeatures":
+        """
+        :param side:  "rfm" или "air" — откуда брать дату рождения
+        :param dob:   уже разобранная дата рождения (dob_ordinals по колонке)
+        """
+        self = cls()
+        self.row = row
+        self.pos = 0
+        fio = _fio_tokens(row)
+        self.tokens = fio.split(" ")
+        # ФИО исторически сравнивается посимвольно: " ".join(строка) даёт
+        # token_set_ratio токены-символы, важен только их набор
+        self.fio = " ".join(sorted(set(fio) - {" "}))
+        if dob is None:
+            dob_field = "✦Дата рождения" if side == "air" else "Дата рождения"
+            dob = parse_dob(row.get(dob_field))
+        self.dob = int(dob)
+        self.region_field = "✦Регион, где возбудили УД/задержали" in row
+        self.region_ids = _air_region_ids(row)
+        self.other = row.get("Остальные данные", "")
+        self.text_region_ids = _rfm_region_ids(row) if side == "rfm" else set()
+        self.terrorist = is_terrorist(row)
+        self._key = None
+        return self
+
+    def content_key(self) -> int:
+        """Хэш всего, от чего зависит результат сравнения (ключ кэша пар)."""
+        if self._key is None:
+            content = (self.fio, self.dob, sorted(self.region_ids) if self.region_ids is not None else None,
+                       self.region_field, self.other, sorted(self.text_region_ids))
+            digest = hashlib.blake2b(repr(content).encode("utf-8"), digest_size=8).digest()
+            self._key = int.from_bytes(digest, "big", signed=True)     # INTEGER SQLite
+        return self._key
+
+
+# русская «фонетика» для ключа блокировки: глухие/звонкие, близкие гласные
+_PHONETIC_MAP = str.maketrans({
+    "Б": "П", "В": "Ф", "Г": "К", "Д": "Т", "Ж": "Ш", "З": "С", "Щ": "Ш",
+    "О": "А", "Ё": "И", "Е": "И", "Э": "И", "Ы": "И", "Я": "А", "Ю": "У", "Й": "И",
+    "Ь": None, "Ъ": None,
+})
+SURNAME_PREFIX_LEN = 4
+STOP_TOKEN_SHARE = 0.02     # токен чаще, чем в 2% строк (и > 50 строк), — не ключ блока
+STOP_TOKEN_MIN = 50
+
+
+def phonetic_key(token: str) -> str:
+    key = token.translate(_PHONETIC_MAP)
+    # схлопываем повторы: ННА → НА
+    return "".join(ch for i, ch in enumerate(key) if i == 0 or ch != key[i - 1])
+
+
+def _percentiles(sizes) -> str:
+    if not sizes:
+        return "0 blocks"
+    sizes = sorted(sizes)
+    at = lambda q: sizes[min(len(sizes) - 1, int(q * len(sizes)))]
+    return f"{len(sizes)} blocks, median {at(.5)}, p90 {at(.9)}, p99 {at(.99)}, max {sizes[-1]}"
+
+
+def candidate_order(target: MatchFeatures):
+    """
+    Ключ порядка кандидатов для `target`: номер первого общего токена ФИО
+    (по порядку токенов цели; без общих — в конце), затем место в Airtable.
+    """
+    rank = {}
+    for i, token in enumerate(target.tokens):
+        rank.setdefault(token, i)
+    never = len(target.tokens)
+
+    def order(rec):
+        return min((rank[t] for t in rec.tokens if t in rank), default=never), rec.pos
+    return order
+
+
+def shared_tokens(target: MatchFeatures, records) -> List[MatchFeatures]:
+    """Строки `records` хотя бы с одним общим с `target` токеном ФИО."""
+    tokens = set(target.tokens)
+    return [rec for rec in records if not tokens.isdisjoint(rec.tokens)]
+
 
-    def parse_date(date_str):
-        for fmt in formats:
-            try:
-                return datetime.strptime(date_str.strip(), fmt).date()
-            except ValueError:
+class MatchIndex:
+    """
+    Подготовленные строки Airtable (MatchFeatures) в исходном порядке
+    и блоки кандидатов:
+      by_dob      — дата рождения (номер дня)
+      by_token    — токен ФИО (слишком частые токены — стоп-слова, IDF)
+      by_prefix   — первые SURNAME_PREFIX_LEN букв фамилии
+      by_phonetic — фонетический ключ фамилии
+    «full» без совпадения ДР невозможен, поэтому кандидаты на полное
+    совпадение — блок по ДР, из него только строки с общим токеном ФИО
+    (как в прежнем compare_all_mapped: ФИО сравнивается по набору букв,
+    и без общего токена «full» дают и разные люди).
+    """
+
+    def __init__(self, airtable_df: pd.DataFrame):
+        dobs = _dob_column(airtable_df, "✦Дата рождения")
+        self.records = [MatchFeatures.from_row(row, "air", dob)
+                        for row, dob in zip(airtable_df.to_dict("records"), dobs)]
+        self.by_dob = defaultdict(list)
+        self.by_token = defaultdict(list)
+        self.by_prefix = defaultdict(list)
+        self.by_phonetic = defaultdict(list)
+        for pos, rec in enumerate(self.records):
+            rec.pos = pos
+            if rec.dob > 0:
+                self.by_dob[rec.dob].append(rec)
+            for token in dict.fromkeys(rec.tokens):
+                self.by_token[token].append(rec)
+            surname = rec.tokens[0]
+            if surname:
+                self.by_prefix[surname[:SURNAME_PREFIX_LEN]].append(rec)
+                self.by_phonetic[phonetic_key(surname)].append(rec)
+
+        n = len(self.records)
+        self.stop_tokens = {t for t, recs in self.by_token.items()
+                            if len(recs) > max(STOP_TOKEN_MIN, STOP_TOKEN_SHARE * n)}
+        # вес токена — IDF; стоп-слова и пустой токен ничего не весят
+        self.idf = {t: (0.0 if t in self.stop_tokens or not t else math.log(n / len(recs)))
+                    for t, recs in self.by_token.items()}
+        self.pairs_scored = 0
+        self.rows_blocked = 0
+        self.cascade = dict.fromkeys(CASCADE_STAGES, 0)
+        logging.info("Match index: %d Airtable rows; stop tokens: %s", n,
+                     ", ".join(sorted(self.stop_tokens)) or "-")
+        for name, blocks in (("DOB", self.by_dob), ("FIO token", self.by_token),
+                             ("surname prefix", self.by_prefix), ("surname phonetic", self.by_phonetic)):
+            logging.info("Blocking by %s: %s", name, _percentiles([len(b) for b in blocks.values()]))
+
+    @staticmethod
+    def prepare(rows) -> List[MatchFeatures]:
+        """Строки РФМ (dict или DataFrame) → признаки."""
+        if isinstance(rows, pd.DataFrame):
+            dobs = _dob_column(rows, "Дата рождения")
+            return [MatchFeatures.from_row(row, "rfm", dob) for row, dob in zip(rows.to_dict("records"), dobs)]
+        return [MatchFeatures.from_row(row, "rfm") for row in rows]
+
+    def best_of(self, target: MatchFeatures, candidates):
+        """
+        Лучший кандидат: первое «full»-совпадение в порядке `candidates`
+        → (тип, признаки кандидата | None, score).
+        """
+        best_type, best_score, best = "none", 0, None
+        for cand in candidates:
+            self.pairs_scored += 1
+            mtype, fscore = score_features_cascade(target, cand, self.cascade, full_only=True)
+            if mtype == "none":
                 continue
-        raise ValueError(f"Unsupported date format: {date_str}")
+            if (mtype == "full" and best_type != "full") or (
+                mtype == best_type and fscore > best_score
+            ):
+                best_type, best_score, best = mtype, fscore, cand
+                # «full» нельзя перебить — можно прервать цикл
+                if best_type == "full":
+                    break
+        return best_type, best, best_score
+
+    def full_candidates(self, target: MatchFeatures) -> List[MatchFeatures]:
+        """
+        Кандидаты на «full» — строки блока по ДР с общим токеном ФИО, без
+        повторов. Порядок прежний: по первому общему токену (по порядку
+        токенов цели), внутри — в порядке Airtable.
+        """
+        block = self.by_dob.get(target.dob) if target.dob > 0 else None
+        self.rows_blocked += 1
+        if not block:
+            return []
+        return sorted(shared_tokens(target, block), key=candidate_order(target))
+
+    def ranked_candidates(self, target: MatchFeatures, limit: int = None) -> List[MatchFeatures]:
+        """
+        Кандидаты по всем ключам (ДР, редкие токены ФИО, префикс и фонетика
+        фамилии), от более похожих к менее: вес — сумма IDF общих токенов
+        + бонусы за ДР и фамилию.
+        """
+        weights = defaultdict(float)
+        for rec in self.by_dob.get(target.dob, []) if target.dob > 0 else []:
+            weights[rec.pos] += 10
+        for token in dict.fromkeys(target.tokens):
+            if token in self.stop_tokens or not token:
+                continue
+            for rec in self.by_token.get(token, []):
+                weights[rec.pos] += self.idf[token]
+        surname = target.tokens[0]
+        if surname:
+            for rec in self.by_prefix.get(surname[:SURNAME_PREFIX_LEN], []):
+                weights[rec.pos] += 1
+            for rec in self.by_phonetic.get(phonetic_key(surname), []):
+                weights[rec.pos] += 1
+        ranked = sorted(weights, key=lambda pos: (-weights[pos], pos))
+        return [self.records[pos] for pos in ranked[:limit]]
+
+    def log_stats(self) -> None:
+        brute = self.rows_blocked * len(self.records)
+        logging.info("Blocking: %d rows, %d pairs scored (%.1f per row) instead of %d",
+                     self.rows_blocked, self.pairs_scored,
+                     self.pairs_scored / max(1, self.rows_blocked), brute)
+        if self.cascade["pairs"]:
+            logging.info("Cascade: %s", ", ".join(f"{k} {v}" for k, v in self.cascade.items()))
+
+    def check_recall(self, targets, sample: int = 200, seed: int = 0):
+        """
+        Проверка блокировки на выборке: у скольких строк перебор всех строк
+        с общим токеном ФИО (прежний compare_all_mapped) находит «full»
+        и у скольких — перебор только full_candidates.
+        → (найдено перебором, найдено с блокировкой, размер выборки)
+        """
+        import random
+        targets = list(targets)
+        sample_rows = random.Random(seed).sample(targets, min(sample, len(targets)))
+        brute = blocked = 0
+        for target in sample_rows:
+            brute += any(score_features(target, rec)[0] == "full" for rec in shared_tokens(target, self.records))
+            blocked += any(score_features(target, rec)[0] == "full" for rec in self.full_candidates(target))
+        logging.info("Blocking recall on %d rows: brute force %d, blocked %d", len(sample_rows), brute, blocked)
+        return brute, blocked, len(sample_rows)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+def _region_slots(features, position: dict) -> np.ndarray:
+    """ID регионов Airtable → матрица номеров регионов, дополненная -1."""
+    width = max((len(f.region_ids or ()) for f in features), default=0) or 1
+    slots = np.full((len(features), width), -1, dtype=np.intp)
+    for i, f in enumerate(features):
+        for j, rid in enumerate(sorted(f.region_ids or ())):
+            slots[i, j] = position[rid]
+    return slots
+
+
+def score_pairs(targets: List[MatchFeatures], candidates: List[MatchFeatures], score_cutoff: float = None,
+                threads: int = -1):
+    """
+    Пакетный match_quality для пар (targets[i], candidates[i]):
+    ФИО — одним вызовом rapidfuzz cpdist на всех ядрах, регион — по векторам
+    RegionScorer (один cdist на уникальные тексты), ДР — сравнение номеров дней.
+    → (массив типов, массив total_score) — те же, что у score_features.
+    :param score_cutoff:  порог для ФИО (ниже — 0). Тип не меняется, но
+                          total_score «none»/«partial» пар становится неточным —
+                          годится, когда нужны только «full»
+    :param threads:       потоки rapidfuzz (-1 — все ядра)
+    """
+    n = len(targets)
+    if not n:
+        return np.array([], dtype=object), np.array([])
+    fio = process.cpdist([t.fio for t in targets], [c.fio for c in candidates],
+                         scorer=fuzz.token_set_ratio, dtype=np.float64, workers=threads,
+                         score_cutoff=score_cutoff)
+    t_dob = np.array([t.dob for t in targets], dtype=np.int64)
+    c_dob = np.array([c.dob for c in candidates], dtype=np.int64)
+    ok_dob = (c_dob > 0) & (c_dob == t_dob)
+
+    scorer = get_region_scorer()
+    position = scorer.position
+    slots = _region_slots(candidates, position)
+    valid = slots >= 0
+    # пересечение с ID, найденными в тексте РФМ
+    inter = np.zeros(n, dtype=bool)
+    for i, (t, c) in enumerate(zip(targets, candidates)):
+        if c.region_ids and t.text_region_ids:
+            inter[i] = not c.region_ids.isdisjoint(t.text_region_ids)
+    # нечёткая похожесть текста на регионы кандидата
+    fuzzy = ~inter & valid.any(axis=1) & np.array([bool(t.other) for t in targets])
+    region = np.where(inter, 100.0, 0.0)
+    if fuzzy.any():
+        texts = [targets[i].other for i in np.flatnonzero(fuzzy)]
+        vectors = scorer.matrix(texts)
+        picked = np.take_along_axis(vectors, np.where(valid[fuzzy], slots[fuzzy], 0), axis=1)
+        region[fuzzy] = np.where(valid[fuzzy], picked, 0).max(axis=1)
+    # нестандартные строки — как в score_features
+    for i, (t, c) in enumerate(zip(targets, candidates)):
+        if c.region_ids is None or t.region_field:
+            region[i] = _region_score_slow(t.row, c.row)
+
+    total = fio * 2 + region + np.where(ok_dob, 100, 0)
+    ok = (fio >= 85).astype(int) + ok_dob + (region >= 85)
+    types = np.where(ok == 3, "full", np.where(ok == 2, "partial", "none")).astype(object)
+    return types, total
 
-    try:
-        if date1 and date2 and len(date1) > 2 and len(date2) > 2:
-            d1 = parse_date(date1)
-            d2 = parse_date(date2)
-            return d1 == d2
-        
-        return False
-    except ValueError as e:
-        print(e)
-        return False
 
 # ─────────────────────────────────────────────────────────────────────────────
+# Параллельный score_pairs: пары шардируются по строкам РФМ между процессами.
+# MatchIndex передаётся в процесс один раз (initializer; при fork — без
+# pickle вообще), задачи ссылаются на кандидатов номерами строк Airtable.
+PARALLEL_MIN_PAIRS = 20_000     # меньше — накладные расходы пула дороже выигрыша
+_worker_index: MatchIndex = None
+
+
+def _init_worker(index: MatchIndex) -> None:
+    global _worker_index
+    _worker_index = index
+
+
+def _score_shard(task):
+    targets, cand_pos, score_cutoff = task
+    candidates = [_worker_index.records[pos] for pos in cand_pos]
+    # ядра уже заняты процессами пула — rapidfuzz в один поток
+    return score_pairs(targets, candidates, score_cutoff=score_cutoff, threads=1)
+
+
+def score_pairs_parallel(index: MatchIndex, targets, candidates, score_cutoff: float = None,
+                         workers: int = 1):
+    """
+    score_pairs в `workers` процессах; результат в исходном порядке пар,
+    тот же, что у score_pairs. Кандидаты — строки index.records.
+    """
+    n = len(targets)
+    if workers <= 1 or n < PARALLEL_MIN_PAIRS:
+        return score_pairs(targets, candidates, score_cutoff=score_cutoff)
+    # векторы регионов считаются в родителе: процессы получают их готовыми
+    get_region_scorer().prime({t.other for t in targets if t.other})
+
+    # шарды — целые строки РФМ (пары одной строки идут подряд)
+    bounds, step = [0], -(-n // (workers * 4))
+    while bounds[-1] < n:
+        end = min(n, bounds[-1] + step)
+        while end < n and targets[end] is targets[end - 1]:
+            end += 1
+        bounds.append(end)
+    tasks = [(targets[a:b], [c.pos for c in candidates[a:b]], score_cutoff)
+             for a, b in zip(bounds, bounds[1:])]
+
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context("fork" if "fork" in methods else None)
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(index,)) as pool:
+        parts = pool.map(_score_shard, tasks)     # map сохраняет порядок задач
+    logging.info("Scored %d pairs in %d shards on %d processes", n, len(tasks), workers)
+    return (np.concatenate([types for types, _ in parts]),
+            np.concatenate([totals for _, totals in parts]))
+
+
 def find_best_match(
     target_row: dict,
     airtable_df: pd.DataFrame,
+    index: MatchIndex = None,
 ):
 # ) -> Tuple[MatchType, Dict | None, int]:
     """
     Для одной строки RFM ищем лучший вариант в Airtable.
+    Результат тот же, что у перебора всей таблицы: первое «full» в порядке
+    Airtable, — но перебирается только блок строк с той же ДР.
+    :param index:  MatchIndex(airtable_df), построенный один раз на запуск
+    """
+    if index is None:
+        index = MatchIndex(airtable_df)
+    target = MatchFeatures.from_row(target_row, "rfm")
+    index.rows_blocked += 1
+    # блок по ДР уже в порядке Airtable
+    block = index.by_dob.get(target.dob, []) if target.dob > 0 else []
+    best_type, best, best_score = index.best_of(target, block)
+    return best_type, (dict(best.row) if best else None), best_score
+
+def top_matches(target_row: dict, index: MatchIndex, k: int = 3) -> List[Tuple[MatchType, Dict, int]]:
+    """
+    k самых похожих строк Airtable для ручной проверки: кандидаты из всех
+    блоков индекса (MatchIndex.ranked_candidates), отсортированные по типу
+    совпадения и score → [(тип, строка Airtable, score)].
+    """
+    target = MatchFeatures.from_row(target_row, "rfm")
+    rank = {"full": 0, "partial": 1, "none": 2}
+    scored = [(*score_features(target, cand), cand)
+              for cand in index.ranked_candidates(target, limit=max(k * 10, 50))]
+    scored.sort(key=lambda s: (rank[s[0]], -s[1], s[2].pos))
+    return [(mtype, dict(cand.row), score) for mtype, score, cand in scored[:k]]
+
+def matcher_version() -> str:
+    """Версия сравнения для кэша пар: логика + справочник регионов."""
+    return f"{MATCHER_VERSION}:{get_gazetteer().version}"
+
+def _score_blocks(index, pair_targets, pair_cands, cache=None, workers: int = 1):
+    """
+    score_pairs с кэшем пар: считаются только пары, которых нет в кэше
+    (новая или изменённая строка хотя бы с одной стороны).
+    """
+    if cache is None:
+        return score_pairs_parallel(index, pair_targets, pair_cands, score_cutoff=85, workers=workers)
+    keys = [(t.content_key(), c.content_key()) for t, c in zip(pair_targets, pair_cands)]
+    found = cache.lookup(keys)
+    todo = [k for k, key in enumerate(keys) if key not in found]
+    new_types, new_totals = score_pairs_parallel(index, [pair_targets[k] for k in todo],
+                                                 [pair_cands[k] for k in todo], score_cutoff=85, workers=workers)
+    # для «none» score не нужен (и с score_cutoff неточен)
+    cache.store((keys[k], t, s if t != "none" else 0) for k, t, s in zip(todo, new_types, new_totals))
+    types = np.empty(len(keys), dtype=object)
+    totals = np.zeros(len(keys))
+    for k, key in enumerate(keys):
+        if key in found:
+            types[k], totals[k] = found[key]
+    types[todo] = new_types
+    totals[todo] = new_totals
+    cache.log_stats()
+    return types, totals
+
+def _features_hash(rec: MatchFeatures) -> str:
+    """
+    Всё, от чего зависят «full» и порядок кандидатов, кроме места в таблице
+    (перенумерация строк РФМ результат не меняет).
     """
-    best_type, best_score, best_row = "none", 0, None
+    return f"{rec.content_key():x}:{hashlib.blake2b(' '.join(rec.tokens).encode('utf-8'), digest_size=8).hexdigest()}"
 
-    for _, air_row in airtable_df.iterrows():
-        mtype, fscore = match_quality(target_row, air_row.to_dict())
-        if mtype == "none":
+def incremental_blocks(index: MatchIndex, targets: List[MatchFeatures], previous: dict):
+    """
+    Блоки кандидатов по таблице совпадений прошлого запуска (match_table).
+    Результат тот же, что у index.full_candidates для всех строк:
+      • строка РФМ новая/изменилась (по _features_hash) или её прошлое «full» в Airtable
+        удалено/изменено — все кандидаты (full_candidates);
+      • иначе — прошлое «full» (если было) и новые/изменённые строки Airtable
+        из того же блока по ДР с общим токеном ФИО: неизменённые строки «full» стать не могли.
+    None — если порядок неизменённых строк Airtable другой (сравнить полностью).
+    """
+    if any("_air_id" not in rec.row for rec in index.records):
+        return None
+    current = [(rec.row["_air_id"], _features_hash(rec)) for rec in index.records]
+    before = dict(map(tuple, previous["air"]))
+    unchanged = {air_id for air_id, h in current if before.get(air_id) == h}
+    if [a for a, _ in previous["air"] if a in unchanged] != [a for a, _ in current if a in unchanged]:
+        logging.info("Incremental compare: Airtable rows were reordered – full compare")
+        return None
+
+    by_id = {rec.row["_air_id"]: rec for rec in index.records}
+    delta_by_dob = defaultdict(list)
+    for rec in index.records:
+        if rec.row["_air_id"] not in unchanged and rec.dob > 0:
+            delta_by_dob[rec.dob].append(rec)
+
+    rows = previous["rows"]
+    blocks, full = [], 0
+    for target in targets:
+        h = _features_hash(target)
+        best = rows.get(h, "missing")
+        if best == "missing" or (best is not None and best not in unchanged):
+            blocks.append(index.full_candidates(target))
+            full += 1
             continue
-        if (mtype == "full" and best_type != "full") or (
-            mtype == best_type and fscore > best_score
-        ):
-            best_type, best_score, best_row = mtype, fscore, air_row.to_dict()
-            # best_row["✦Регион, где возбудили УД/задержали"] = _region(best_row)
-
-            # «full» нельзя перебить — можно прервать цикл
-            if best_type == "full":
-                break
-    return best_type, best_row, best_score
-
-def compare_all_mapped(df_new, airtable_df, report, tq: TelegramQueue):
-    index = 0
+        index.rows_blocked += 1
+        block = shared_tokens(target, delta_by_dob.get(target.dob, [])) if target.dob > 0 else []
+        if best is not None:
+            block.append(by_id[best])
+        blocks.append(sorted(block, key=candidate_order(target)))
+    logging.info("Incremental compare: %d RFM rows re-matched in full, %d only against %d new/edited Airtable rows",
+                 full, len(targets) - full, len(index.records) - len(unchanged))
+    return blocks
+
+def compare_all_mapped(df_new, airtable_df, report, tq: TelegramQueue, index: MatchIndex = None,
+                       cache=None, table=None, incremental: bool = False, workers: int = 1):
+    """
+    :param cache:        match_cache.PairCache — пары, не изменившиеся с прошлого
+                         запуска, берутся из кэша
+    :param table:        match_table.MatchTable — сюда сохраняются совпадения
+    :param incremental:  сравнивать по таблице прошлого запуска только
+                         изменившееся (incremental_blocks); результат тот же
+    :param workers:      процессов для подсчёта пар (score_pairs_parallel);
+                         уведомления — здесь же, в порядке строк РФМ
+    """
     matches_all: List[Dict] = []
 
-    def name_keys(row):
-        # Take first N chars of the normalized FIO tokens as a crude filter
-        tokens = _fio_tokens(row)
-        tokens = tokens.split(" ")
-        return tokens
-
     # Build index for airtable_df
-    airtable_index = defaultdict(list)
-    for _, row in airtable_df.iterrows():
-        row_dict = row.to_dict()
-        keys = name_keys(row_dict)
-        for key in keys:
-            airtable_index[key].append(row_dict)
+    if index is None:
+        index = MatchIndex(airtable_df)
 
     # For each row in df_new, only compare to similar name keys
-    for _, rfm_row in df_new.iterrows():
-        index += 1
-        rfm_row_dict = rfm_row.to_dict()
-        candidates = []
-        keys = name_keys(rfm_row_dict)
-        for key in keys:
-            candidates += airtable_index.get(key, [])
-        # candidates = list(set(candidates))
-
-        best_type, best_score, best_row = "none", 0, None
-        for air_row in candidates:
-            mtype, fscore = match_quality(rfm_row_dict, air_row)
-            if mtype == "none":
-                continue
-            if (mtype == "full" and best_type != "full") or (
-                mtype == best_type and fscore > best_score
-            ):
-                best_type, best_score, best_row = mtype, fscore, air_row
-                if best_type == "full":
-                    break
+    targets = index.prepare(df_new)
+    # «full» — только среди строк с той же ДР и общим токеном ФИО (см. MatchIndex.full_candidates);
+    # все пары считаются одним пакетом (score_pairs), побеждает первое «full»
+    version = matcher_version()
+    previous = table.load(version) if table is not None and incremental else None
+    blocks = incremental_blocks(index, targets, previous) if previous else None
+    if blocks is None:
+        blocks = [index.full_candidates(target) for target in targets]
+    pair_targets = [t for t, block in zip(targets, blocks) for _ in block]
+    pair_cands = [c for block in blocks for c in block]
+    types, totals = _score_blocks(index, pair_targets, pair_cands, cache, workers)
+    index.pairs_scored += len(pair_cands)
+
+    start = 0
+    found = {}
+    for num, (target, block) in enumerate(zip(targets, blocks), 1):
+        best_type, best, best_score = "none", None, 0
+        for k in range(start, start + len(block)):
+            if types[k] == "full":
+                best_type, best, best_score = "full", pair_cands[k], float(totals[k])
+                break
+        start += len(block)
+        best_row = dict(best.row) if best else None
+        found[_features_hash(target)] = best.row.get("_air_id") if best else None
 
         terr_match = ""
         if best_type != "none" and best_row:
-            notify("match_all", rfm_row, best_type, best_score, best_row, report, tq=tq)
-        
-        logging.info(f"Best match all ({index}/{len(df_new)}) {terr_match}: {best_type}({best_score})\nRFM: {rfm_row.get('Изначальный текст')}\nAIR: {best_row}")
-        
+            notify("match_all", target.row, best_type, best_score, best_row, report, tq=tq)
+            matches_all.append({**target.row, **best_row})
+
+        logging.info(f"Best match all ({num}/{len(targets)}) {terr_match}: {best_type}({best_score})\nRFM: {target.row.get('Изначальный текст')}\nAIR: {best_row}")
 
+    index.log_stats()
+    if table is not None and all("_air_id" in rec.row for rec in index.records):
+        table.save(version, [(rec.row["_air_id"], _features_hash(rec)) for rec in index.records], found)
     return matches_all
 
 def compare_all_slow(df_new, airtable_df, report):
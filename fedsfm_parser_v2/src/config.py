@@ -3,15 +3,28 @@ from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 SRC_DIR = BASE_DIR / "src"
-LOGS_DIR = BASE_DIR / "logs"
-DATA_DIR = BASE_DIR / "data"
-AIRTABLE_CACHE_DIR = BASE_DIR / "airtable_cache"
+# каталог данных, логов, отчётов и кэшей (переопределяется для бенчмарков)
+WORK_DIR = Path(os.getenv("FEDSFM_WORK_DIR", BASE_DIR))
+LOGS_DIR = WORK_DIR / "logs"
+DATA_DIR = WORK_DIR / "data"
+AIRTABLE_CACHE_DIR = WORK_DIR / "airtable_cache"
 
 for p in (LOGS_DIR, DATA_DIR, AIRTABLE_CACHE_DIR):
     p.mkdir(parents=True, exist_ok=True)
 
-PARSE_URL = "https://www.fedsfm.ru/documents/terrorists-catalog-portal-act"
+PARSE_URL = os.getenv("RFM_PARSE_URL", "https://www.fedsfm.ru/documents/terrorists-catalog-portal-act")
+FETCH_STATE_FILE = DATA_DIR / "rfm_fetch_state.json"   # ETag / Last-Modified / хэш секции
+PARSE_CACHE_FILE = DATA_DIR / "rfm_parse_cache.csv"    # разобранные строки прошлого запуска
+REGION_SCORES_FILE = DATA_DIR / "region_scores.npz"   # похожесть текстов РФМ на регионы справочника
+PAIR_CACHE_FILE = DATA_DIR / "match_cache.sqlite"      # результаты сравнения пар RFM ↔ Airtable
+PAIR_CACHE_MAX_ROWS = int(os.getenv("PAIR_CACHE_MAX_ROWS", 2_000_000))
+MATCH_TABLE_FILE = DATA_DIR / "match_table.json"      # совпадения полного сравнения прошлого запуска
+# секции страницы РФМ (см. rfm_parser.SECTIONS); russianFL — основной список,
+# остальные только сохраняются, сравниваются и попадают в отчёт
+RFM_SECTIONS = [s.strip() for s in os.getenv("RFM_SECTIONS", "russianFL").split(",") if s.strip()]
 KEEP_FILES_COUNT = int(os.getenv("KEEP_FILES_COUNT", 10))
+# формат снимков data_*: "csv" или "parquet" (колоночный, сжатый; нужен pyarrow)
+SNAPSHOT_FORMAT = os.getenv("SNAPSHOT_FORMAT", "csv")
 
 # Telegram
 TELEGRAM_BOT_TOKEN = None
@@ -36,12 +49,25 @@ AIRTABLE_FIELDS_MAIN = [
 
 AIRTABLE_TABLE_REGIONS = "tblFgR19058Blt28i"
 AIRTABLE_TABLE_CITIES = "tblCBynEJ1blhGSOm"
+# сколько самых похожих строк Airtable выводить в лог для каждой изменённой строки РФМ;
+# 0 — не выводить (включается переменной окружения, например MATCH_TOP_K=3)
+MATCH_TOP_K = int(os.getenv("MATCH_TOP_K", 0))
 
 # Master dataset
-MASTER_FILE = DATA_DIR / "rfm_master.csv"
+MASTER_FILE = DATA_DIR / "rfm_master.csv"                     # полная таблица (собирается из журнала)
+MASTER_EVENTS_FILE = DATA_DIR / "rfm_master_events.jsonl"     # журнал добавлений / удалений
+MASTER_VIEW_FILE = DATA_DIR / "rfm_master_current.json"       # текущий состав списка
+MASTER_HISTORY_DB = DATA_DIR / "rfm_master_history.sqlite"   # история для запросов «на дату»
 
-REPORTS_DIR = BASE_DIR / "reports"
+# Архив снимков: контрольные точки + дельты (см. snapshot_archive.py)
+ARCHIVE_DIR = DATA_DIR / "archive"
+ARCHIVE_CHECKPOINT_EVERY = int(os.getenv("ARCHIVE_CHECKPOINT_EVERY", 30))
+
+REPORTS_DIR = WORK_DIR / "reports"
 REPORTS_DIR.mkdir(exist_ok=True)
 
+# манифест снимков, отчётов и кэшей Airtable (см. manifest.py)
+MANIFEST_FILE = DATA_DIR / "manifest.json"
+
 ALLOWED_USERS_FILE = BASE_DIR / "src" / "allowed_users.csv"     # <-- список ID
 HTML_TEMPLATE = BASE_DIR / "templates" / "report.html" # хранится внутри пакета
\ No newline at end of file
@@ -4,6 +4,7 @@
     $ python -m src.main                # обычный режим
     $ python -m src.main --all          # сравнить весь список RFM ↔ Airtable
     $ python -m src.main --test         # тестовый режим (как прежде)
+    $ python -m src.main --force        # не пропускать запуск при неизменном списке
 Вызывается и из bot_server.py.
 """
 
@@ -21,11 +22,17 @@ from modules.folders_storage import clean_folders
 from modules.telegram_queue import TelegramQueue
 from notify_tools import notify
 from modules.logger import setup_logger
-from rfm_parser import fetch_rfm_list
-from storage import save_dataset, load_latest, save_report, update_master
+from rfm_parser import RFM_SECTION_ID, SECTIONS, configured_section_ids, fetch_rfm_sections, load_fetch_state, save_fetch_state
+from storage import save_dataset, load_latest, save_report, update_master, export_csv, has_snapshot, snapshot_globs
 from compare import diff
+from snapshot_archive import SnapshotArchive
+from master_history import MasterHistory
+from manifest import Manifest
+from match_cache import PairCache
+from match_table import MatchTable
+from regions import get_region_scorer
 from airtable_client import AirtableClient
-from compare_airtable import compare_all_mapped, find_best_match, MatchType, match_quality, missed_regions
+from compare_airtable import MatchIndex, compare_all_mapped, find_best_match, matcher_version, top_matches, MatchType, match_quality, missed_regions, unparsed_dobs
 from html_report import build_report
 from config import (
     AIRTABLE_CACHE_DIR,
@@ -35,6 +42,7 @@ from config import (
     DATA_DIR,
     KEEP_FILES_COUNT,
     LOGS_DIR,
+    MATCH_TOP_K,
     REPORTS_DIR,
     TELEGRAM_BOT_TOKEN,
     TELEGRAM_CHANNEL_ID,
@@ -43,11 +51,74 @@ from utils import get_file_name
 
 # ──────────────────────────────────────────────────────────────────────
 
-def run(*, test_mode: bool = False, compare_all: bool = False) -> None:
+def _row_text(row: Dict) -> str:
+    return row.get('Изначальный текст') or row.get('Имя') or row.get('Наименование')
+
+
+def _archive_snapshot(df: pd.DataFrame, ts: datetime, prefix: str = "data") -> None:
+    # архив — вспомогательная история, его сбой не должен ронять запуск
+    try:
+        SnapshotArchive(prefix).append(df, ts)
+    except Exception as e:
+        logging.warning("Snapshot archive (%s) failed: %s", prefix, e)
+
+
+def _sync_history() -> None:
+    # история для запросов «на дату» догонит журнал при следующем запуске
+    try:
+        with MasterHistory() as history:
+            history.sync()
+    except Exception as e:
+        logging.warning("Master history sync failed: %s", e)
+
+
+def _save_region_scores() -> None:
+    # кэш похожести текстов на регионы — только ускоряет следующий запуск
+    try:
+        get_region_scorer().save()
+    except Exception as e:
+        logging.warning("Region scores cache not saved: %s", e)
+
+
+def _process_extra_section(section, df: pd.DataFrame, ts: datetime, report: List[str]) -> str:
+    """
+    Дополнительная секция РФМ (не #russianFL): сохранение, diff и строки
+    отчёта. Сверка с Airtable для неё не выполняется.
+    Возвращает строку для итоговой сводки.
+    """
+    file_new = save_dataset(df, ts, prefix=section.file_prefix)
+    _archive_snapshot(df, ts, section.file_prefix)
+    df_old, file_old = load_latest(exclude=file_new, prefix=section.file_prefix)
+    if df_old is None:
+        logging.info("%s: first launch – diff step skipped", section.section_id)
+        added, removed, changed = [], [], []
+    else:
+        added, removed, changed = diff(df_old, df, section.compare_columns)
+    counts = f"+{len(added)} | -{len(removed)} | ~{len(changed)}"
+    logging.info("%s diff: %s", section.section_id, counts)
+
+    report.append(f"[{section.title}] New file: {get_file_name(file_new)}; {len(df)} записей")
+    for row in added:
+        report.append(f"#добавлен [{section.title}]\n{_row_text(row)}")
+    for row in removed:
+        report.append(f"#удален [{section.title}]\n{_row_text(row)}")
+    for old_row, new_row in changed:
+        report.append(f"#обновлен [{section.title}] (было/стало)\n{_row_text(old_row)}\n\n{_row_text(new_row)}")
+
+    return f"{section.title}: {len(df)} записей, {counts}"
+
+
+def run(*, test_mode: bool = False, compare_all: bool = False, force: bool = False,
+        incremental: bool = False, workers: int = 1) -> None:
     """
     Основной workflow.
     :param test_mode:    эхо-режим, отключает часть уведомлений (как раньше)
     :param compare_all:  сравнить RFM с каждым человеком в Airtable (вопрос «1»)
+    :param force:        выполнить весь цикл, даже если секция РФМ не изменилась
+    :param incremental:  полное сравнение по таблице совпадений прошлого запуска:
+                         заново — только изменившиеся строки РФМ и новые/изменённые
+                         строки Airtable (результат как у compare_all)
+    :param workers:      процессов для полного сравнения (результат тот же)
     """
     try:
         ts = datetime.now()
@@ -57,17 +128,35 @@ def run(*, test_mode: bool = False, compare_all: bool = False) -> None:
 
         tq = TelegramQueue(TELEGRAM_BOT_TOKEN, TELEGRAM_CHANNEL_ID, base_delay=1.0, max_tries=7)
 
+        # основной список первым, остальные секции — в порядке из конфига
+        section_ids = configured_section_ids()
+
         clean_folders([
             (AIRTABLE_CACHE_DIR, "*.csv"),
             (LOGS_DIR, "*.log"),
-            (DATA_DIR, "*.csv"),
+            *[(DATA_DIR, pattern) for sid in section_ids for pattern in snapshot_globs(SECTIONS[sid].file_prefix)],
             (REPORTS_DIR, "*.txt"),
-        ], keep_count=KEEP_FILES_COUNT)
+            (REPORTS_DIR, "*.csv"),     # CSV-выгрузки parquet-снимков
+        ], keep_count=KEEP_FILES_COUNT, manifest=Manifest())
 
         # 1. ── Парсим RFM ────────────────────────────────────────────────────
-        df_new = fetch_rfm_list()
+        # без предыдущего снимка сравнивать не с чем — состояние не используем
+        # в инкрементальном режиме изменения могут быть только в Airtable —
+        # РФМ сравнивается и без изменений на странице
+        fetch_state = load_fetch_state() if has_snapshot() and not force and not incremental else {}
+
+        sections = fetch_rfm_sections(section_ids, state=fetch_state)
+        if not sections:
+            logging.info("RFM list not changed since last run – parse, diff and report skipped")
+            save_fetch_state(fetch_state)   # свежие ETag/Last-Modified для следующего запроса
+            tq.close()
+            logging.info("=== Finished (no change) ===")
+            return
+
+        df_new = sections[RFM_SECTION_ID]
         file_new = save_dataset(df_new, ts)
         logging.info("Dataset saved: %s", file_new)
+        _archive_snapshot(df_new, ts)
 
         # 2. ── Diff «новый vs предыдущий RFM» ───────────────────────────────
         df_old, file_old = load_latest(exclude=file_new)
@@ -83,6 +172,7 @@ def run(*, test_mode: bool = False, compare_all: bool = False) -> None:
 
         # TODO:
         update_master(df_new, ts)
+        _sync_history()
 
         # 2.5 -- RFM отчет  ─────────────────────────────────────────────────────
         report = []
@@ -107,6 +197,13 @@ def run(*, test_mode: bool = False, compare_all: bool = False) -> None:
             msg += f"\n\n{new_row.get('Изначальный текст') or new_row.get('Имя')}"
             report.append(msg)
 
+        # 2.6 -- Остальные секции РФМ (если настроены) ─────────────────────────
+        extra_summary = [
+            _process_extra_section(SECTIONS[sid], sections[sid], ts, report)
+            for sid in section_ids[1:]
+            if sid in sections      # секция могла пропасть со страницы
+        ]
+
         # 3. ── Airtable ─────────────────────────────────────────────────────
         client = AirtableClient()
         airtable_df, airtable_file = client.fetch_df(
@@ -117,17 +214,22 @@ def run(*, test_mode: bool = False, compare_all: bool = False) -> None:
         )
         logging.info("Airtable rows: %d", len(airtable_df))
 
-        airtable_df = pd.read_csv(airtable_file, dtype=str)
-
         report.append(f"Airtable file: {get_file_name(airtable_file)}; {len(airtable_df)} записей")
 
+        # строки Airtable нормализуются один раз на запуск
+        match_index = MatchIndex(airtable_df)
+
         # 4. ── Сравнение added/removed с Airtable (уведомления) ─────────────        
         if not compare_all:
             def _find_match(row, mode: str, index: int, count: int):
-                mtype, mrow, score = find_best_match(row, airtable_df)
+                mtype, mrow, score = find_best_match(row, airtable_df, index=match_index)
                 logging.info(f"Best match {mode} ({index}/{count}): {mtype}({score})\nRFM: {row.get('Изначальный текст')}\nAIR: {mrow}")
                 if mtype != "none":
                     notify(mode, row, mtype, score, mrow, report, tq=tq)
+                if MATCH_TOP_K:
+                    for k, (ctype, crow, cscore) in enumerate(top_matches(row, match_index, MATCH_TOP_K), 1):
+                        fio = " ".join(str(crow.get(f) or "") for f in ("✦ Фамилия", "✦Имя", "✦Отчество"))
+                        logging.info("  candidate %d: %s(%.0f) %s, %s", k, ctype, cscore, fio, crow.get("✦Дата рождения"))
 
             index = 0
             for row in added_rfm:
@@ -143,23 +245,35 @@ def run(*, test_mode: bool = False, compare_all: bool = False) -> None:
             for old_row, row in changed_rfm:
                 _find_match(row, "changed", index, len(changed_rfm))
 
+            match_index.log_stats()
+
 
         # 5. ── Полное сравнение (если compare_all=True) ──────────────────────
         index = 0
         # just matches list
         matches_all: List[Dict] = []
         if compare_all:
-            logging.info("Running FULL compare RFM ↔ Airtable …")
+            logging.info("Running FULL compare RFM ↔ Airtable%s …", " (incremental)" if incremental else "")
 
-            matches_all = compare_all_mapped(df_new, airtable_df, report, tq=tq)
+            with PairCache(matcher_version()) as pair_cache:
+                matches_all = compare_all_mapped(df_new, airtable_df, report, tq=tq, index=match_index,
+                                                 cache=pair_cache, table=MatchTable(), incremental=incremental,
+                                                 workers=workers)
 
             logging.info("Full compare: %d matches", len(matches_all))
 
+        _save_region_scores()
+
         if len(missed_regions) > 0:
             missed_regions_list = ', '.join(list(missed_regions))
             logging.warning(f"Missed regions list: [{missed_regions_list}]")
             tq.send_message(f"! В словаре регионов есть пропущенные ключи: [{missed_regions_list}]")
 
+        if unparsed_dobs:
+            logging.warning("Unparsed dates of birth: %d (%s)", len(unparsed_dobs),
+                            ", ".join(sorted(unparsed_dobs)[:20]))
+            report.append(f"Нераспознанные даты рождения: {len(unparsed_dobs)}")
+
         # 6. ── HTML-отчёт ────────────────────────────────────────────────────
         rfm_report_save = "\n----------\n".join(report)
         report_path = save_report(rfm_report_save, ts)
@@ -178,16 +292,22 @@ def run(*, test_mode: bool = False, compare_all: bool = False) -> None:
         summary = "#отчет\n"
         summary += f"RFM: {len(df_new)} записей\n"
         summary += f"+{len(added_rfm)} | -{len(removed_rfm)} | ~{len(changed_rfm)}"
+        for line in extra_summary:
+            summary += f"\n{line}"
 
         logging.info(f"Summary: {summary}")
         tq.send_message(summary)
-        tq.send_document(str(file_new))
+        tq.send_document(str(export_csv(file_new)))
         tq.send_document(str(report_path))
 
         # Make sure we wait before the script exits:
         tq.join()   # wait until the queue is empty
         tq.close()  # stop worker thread cleanly
 
+        # состояние запоминаем только после успешного прогона,
+        # иначе упавший запуск навсегда «спрятал» бы изменения
+        save_fetch_state(fetch_state)
+
         logging.info("=== Finished ===")
 
     except Exception as e:
@@ -201,5 +321,12 @@ if __name__ == "__main__":
     parser.add_argument("--test", action="store_true", help="Test mode (quiet)")
     parser.add_argument("--all",  action="store_true",
                         help="Compare EVERY RFM row with Airtable")
+    parser.add_argument("--force", action="store_true",
+                        help="Run the whole pipeline even if the RFM list did not change")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Like --all, but re-match only RFM/Airtable rows changed since the last full compare")
+    parser.add_argument("--workers", type=int, default=1, metavar="N",
+                        help="Processes for the full compare (--all / --incremental)")
     args = parser.parse_args()
-    run(test_mode=args.test, compare_all=args.all)
+    run(test_mode=args.test, compare_all=args.all or args.incremental, force=args.force,
+        incremental=args.incremental, workers=args.workers)
@@ -0,0 +1,164 @@
+"""
+Манифест файлов запуска: снимки РФМ, отчёты, CSV-выгрузки и кэши Airtable.
+
+Для каждого файла хранится путь, время из имени файла, число строк,
+sha256 содержимого и статус ("ok" / "invalid"). Записи сгруппированы по
+(kind, group) и упорядочены по времени из имени — последний снимок
+и кандидаты на удаление берутся без glob/stat, а копирование или
+восстановление файлов (смена mtime) не меняет порядок.
+
+Если манифеста нет или он повреждён, он собирается заново по каталогам.
+"""
+
+from __future__ import annotations
+
+import fnmatch, hashlib, json, logging, os, re
+from datetime import datetime
+from pathlib import Path
+
+from config import AIRTABLE_CACHE_DIR, DATA_DIR, MANIFEST_FILE, REPORTS_DIR, WORK_DIR
+
+TS_FORMAT = "%Y_%m_%d__%H_%M_%S"
+
+# kind → (каталог, шаблон имени, формат времени в имени)
+KINDS = {
+    "snapshot": (DATA_DIR, re.compile(r"^(?P<group>.+?)_(?P<ts>\d{4}_\d\d_\d\d__\d\d_\d\d_\d\d)\.(csv|parquet)$"), TS_FORMAT),
+    "report":   (REPORTS_DIR, re.compile(r"^(?P<group>report)_(?P<ts>\d{4}_\d\d_\d\d__\d\d_\d\d_\d\d)\.txt$"), TS_FORMAT),
+    "export":   (REPORTS_DIR, re.compile(r"^(?P<group>.+?)_(?P<ts>\d{4}_\d\d_\d\d__\d\d_\d\d_\d\d)\.csv$"), TS_FORMAT),
+    "airtable": (AIRTABLE_CACHE_DIR, re.compile(r"^(?P<group>airtable)_(?P<ts>\d{8}_\d{6})\.csv$"), "%Y%m%d_%H%M%S"),
+}
+
+
+def file_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _relative(path: Path) -> str:
+    path = Path(path).resolve()
+    try:
+        return path.relative_to(WORK_DIR).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def _classify(path: Path):
+    """(kind, group, ts) по каталогу и имени файла или None."""
+    path = Path(path)
+    for kind, (folder, pattern, ts_format) in KINDS.items():
+        if path.parent.resolve() != folder.resolve():
+            continue
+        m = pattern.match(path.name)
+        if m:
+            ts = datetime.strptime(m["ts"], ts_format).strftime(TS_FORMAT)
+            return kind, m["group"], ts
+    return None
+
+
+class Manifest:
+    def __init__(self, path: Path = MANIFEST_FILE):
+        self.path = Path(path)
+        self.groups = {}        # (kind, group) → [entry, ...] по возрастанию ts
+        if not self._load():
+            self.rebuild()
+
+    # ---------- чтение ----------
+    def entries(self, kind: str, group: str = None):
+        if group is not None:
+            return list(self.groups.get((kind, group), []))
+        return sorted((e for (k, _), items in self.groups.items() if k == kind for e in items),
+                      key=lambda e: e["ts"])
+
+    def latest(self, kind: str, group: str, exclude=None):
+        """Путь к последнему файлу группы со статусом "ok" (кроме `exclude`)."""
+        exclude = _relative(exclude) if exclude else None
+        for entry in reversed(self.groups.get((kind, group), [])):
+            if entry["status"] == "ok" and entry["path"] != exclude:
+                return WORK_DIR / entry["path"]
+        return None
+
+    def files(self, folder: Path, pattern: str):
+        """
+        Файлы каталога `folder`, подходящие под `pattern`, от новых к старым;
+        None — если каталог манифестом не отслеживается.
+        """
+        folder = Path(folder).resolve()
+        if all(f.resolve() != folder for f, _, _ in KINDS.values()):
+            return None
+        found = [e for items in self.groups.values() for e in items
+                 if (WORK_DIR / e["path"]).parent.resolve() == folder
+                 and fnmatch.fnmatch(Path(e["path"]).name, pattern)]
+        return [WORK_DIR / e["path"] for e in sorted(found, key=lambda e: e["ts"], reverse=True)]
+
+    # ---------- запись ----------
+    def register(self, path: Path, rows: int = None, save: bool = True) -> dict | None:
+        info = _classify(path)
+        if info is None:
+            logging.debug("Manifest: %s does not match any known file pattern", path)
+            return None
+        kind, group, ts = info
+        entry = {"path": _relative(path), "kind": kind, "group": group, "ts": ts,
+                 "rows": rows, "hash": file_hash(path), "status": "ok"}
+        items = [e for e in self.groups.get((kind, group), []) if e["path"] != entry["path"]]
+        items.append(entry)
+        items.sort(key=lambda e: e["ts"])
+        self.groups[(kind, group)] = items
+        if save:
+            self.save()
+        return entry
+
+    def mark_invalid(self, path: Path) -> None:
+        rel = _relative(path)
+        for items in self.groups.values():
+            for entry in items:
+                if entry["path"] == rel:
+                    entry["status"] = "invalid"
+        self.save()
+
+    def forget(self, path: Path, save: bool = True) -> None:
+        rel = _relative(path)
+        for key, items in self.groups.items():
+            self.groups[key] = [e for e in items if e["path"] != rel]
+        if save:
+            self.save()
+
+    def rebuild(self) -> None:
+        """Сбор манифеста заново по каталогам (строки не считаются)."""
+        self.groups = {}
+        for folder in {folder for folder, _, _ in KINDS.values()}:
+            if not folder.exists():
+                continue
+            for path in folder.iterdir():
+                if path.is_file() and _classify(path):
+                    self.register(path, save=False)
+        self.save()
+        logging.info("Manifest rebuilt: %s (%d files)", self.path,
+                     sum(len(items) for items in self.groups.values()))
+
+    def save(self) -> None:
+        entries = [e for items in self.groups.values() for e in items]
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"entries": entries}, f, ensure_ascii=False, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        tmp.replace(self.path)
+
+    # ---------- внутреннее ----------
+    def _load(self) -> bool:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)["entries"]
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logging.warning("Cannot read manifest %s: %s – rebuilding", self.path, e)
+            return False
+        for entry in entries:
+            self.groups.setdefault((entry["kind"], entry["group"]), []).append(entry)
+        for items in self.groups.values():
+            items.sort(key=lambda e: e["ts"])
+        return True
@@ -0,0 +1,205 @@
+"""
+История мастер-списка РФМ в SQLite: кто был в списке на дату, за период,
+периоды нахождения в списке для человека.
+
+Таблица listings — по строке на каждый период нахождения в списке
+(added ≤ дата < removed; removed IS NULL — до сих пор в списке), с индексами
+по ID, нормализованному имени и датам. Заполняется из журнала мастер-списка
+(master_log.MasterLog) инкрементально: в meta хранится смещение журнала,
+до которого история уже построена.
+
+Даты — строки ISO (YYYY-MM-DD), поэтому сравниваются как строки.
+"""
+
+from __future__ import annotations
+
+import json, logging, sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+from config import MASTER_HISTORY_DB
+from master_log import MasterLog
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    id        INTEGER PRIMARY KEY,
+    person_id TEXT NOT NULL,
+    name      TEXT NOT NULL,
+    name_norm TEXT NOT NULL,
+    dob       TEXT,
+    added     TEXT NOT NULL,
+    removed   TEXT,
+    data      TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_listings_person  ON listings(person_id);
+CREATE INDEX IF NOT EXISTS ix_listings_name    ON listings(name_norm);
+CREATE INDEX IF NOT EXISTS ix_listings_added   ON listings(added, removed);
+CREATE INDEX IF NOT EXISTS ix_listings_removed ON listings(removed);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+RESULT_COLUMNS = ["person_id", "name", "dob", "added", "removed"]
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(str(name or "").upper().replace("Ё", "Е").split())
+
+
+class MasterHistory:
+    def __init__(self, db_path: Path = MASTER_HISTORY_DB, log: MasterLog = None):
+        self.db_path = Path(db_path)
+        self.log = log or MasterLog()
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- построение ----------
+    def sync(self) -> int:
+        """
+        Дочитывает журнал мастер-списка с последнего обработанного места.
+        Возвращает число применённых событий.
+        """
+        offset = int(self._meta("log_offset") or 0)
+        size = self.log.size()
+        if size < offset:       # журнал пересоздан — строим заново
+            logging.warning("Master log is shorter than history offset – rebuilding %s", self.db_path)
+            self.conn.execute("DELETE FROM listings")
+            offset = 0
+        if size == offset:
+            return 0
+
+        count = 0
+        with self.conn:         # одна транзакция: события + новое смещение
+            for event in self.log.iter_events(offset):
+                self._apply(event)
+                count += 1
+            self._set_meta("log_offset", size)
+        logging.info("Master history: %d events applied (%s)", count, self.db_path)
+        return count
+
+    def _apply(self, event: dict) -> None:
+        if event["op"] == "added":
+            row = event["row"]
+            name = row.get("Имя", "")
+            self.conn.execute(
+                "INSERT INTO listings (person_id, name, name_norm, dob, added, removed, data) "
+                "VALUES (?, ?, ?, ?, ?, NULL, ?)",
+                (event["ID"], name, normalize_name(name), row.get("Дата рождения", ""),
+                 event["date"], json.dumps(row, ensure_ascii=False)),
+            )
+        else:
+            self.conn.execute(
+                "UPDATE listings SET removed = ? WHERE person_id = ? AND removed IS NULL",
+                (event["date"], event["ID"]),
+            )
+
+    # ---------- запросы ----------
+    def as_of(self, date: str) -> pd.DataFrame:
+        """Кто был в списке на дату `date`."""
+        return self._query(
+            "WHERE added <= ? AND (removed IS NULL OR removed > ?) ORDER BY name_norm",
+            (date, date),
+        )
+
+    def listed_between(self, start: str, end: str) -> pd.DataFrame:
+        """Кто был в списке хотя бы один день в периоде [start, end]."""
+        return self._query(
+            "WHERE added <= ? AND (removed IS NULL OR removed > ?) ORDER BY name_norm",
+            (end, start),
+        )
+
+    def changes_between(self, start: str, end: str) -> pd.DataFrame:
+        """Периоды, начавшиеся или закончившиеся в [start, end]."""
+        return self._query(
+            "WHERE added BETWEEN ? AND ? OR removed BETWEEN ? AND ? ORDER BY added",
+            (start, end, start, end),
+        )
+
+    def timeline(self, key: str) -> pd.DataFrame:
+        """Периоды нахождения в списке по ID или по имени."""
+        return self._query(
+            "WHERE person_id = ? OR name_norm = ? ORDER BY added",
+            (key, normalize_name(key)),
+        )
+
+    def listed_on_many(self, queries) -> pd.DataFrame:
+        """
+        Пакетная проверка: `queries` — пары (ID или имя, дата).
+        Возвращает найденные периоды с колонками key, date + RESULT_COLUMNS;
+        запросы без совпадений в результат не попадают.
+        """
+        cur = self.conn.cursor()
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS q (n INTEGER, key TEXT, key_norm TEXT, date TEXT)")
+        cur.execute("DELETE FROM q")
+        cur.executemany("INSERT INTO q VALUES (?, ?, ?, ?)",
+                        ((n, key, normalize_name(key), date) for n, (key, date) in enumerate(queries)))
+        columns = ", ".join(f"l.{c}" for c in RESULT_COLUMNS)
+        # два индексных соединения вместо OR — так SQLite использует оба индекса
+        sql = f"""
+            SELECT q.n, q.key, q.date, {columns} FROM q JOIN listings l ON l.person_id = q.key
+             WHERE l.added <= q.date AND (l.removed IS NULL OR l.removed > q.date)
+            UNION
+            SELECT q.n, q.key, q.date, {columns} FROM q JOIN listings l ON l.name_norm = q.key_norm
+             WHERE l.added <= q.date AND (l.removed IS NULL OR l.removed > q.date)
+            ORDER BY 1
+        """
+        df = pd.read_sql_query(sql, self.conn)
+        return df.drop(columns="n")
+
+    # ---------- внутреннее ----------
+    def _query(self, where: str, params) -> pd.DataFrame:
+        sql = f"SELECT {', '.join(RESULT_COLUMNS)} FROM listings {where}"
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def _meta(self, key: str):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    # Запросы к истории мастер-списка:
+    #   $ python master_history.py as-of 2025-03-01 [-o out.csv]
+    #   $ python master_history.py between 2025-01-01 2025-03-31
+    #   $ python master_history.py timeline "ИВАНОВ ИВАН ИВАНОВИЧ"
+    #   $ python master_history.py bulk queries.csv -o out.csv   (колонки key,date)
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Point-in-time queries over the RFM master list")
+    parser.add_argument("command", choices=["as-of", "between", "changes", "timeline", "bulk"])
+    parser.add_argument("args", nargs="+")
+    parser.add_argument("-o", "--out", help="сохранить результат в CSV")
+    args = parser.parse_args()
+
+    with MasterHistory() as history:
+        history.sync()
+        if args.command == "as-of":
+            result = history.as_of(args.args[0])
+        elif args.command == "between":
+            result = history.listed_between(*args.args[:2])
+        elif args.command == "changes":
+            result = history.changes_between(*args.args[:2])
+        elif args.command == "timeline":
+            result = history.timeline(" ".join(args.args))
+        else:
+            queries = pd.read_csv(args.args[0], dtype=str, keep_default_na=False)
+            result = history.listed_on_many(zip(queries["key"], queries["date"]))
+
+    if args.out:
+        result.to_csv(args.out, index=False, encoding="utf-8")
+        logging.info("%d rows → %s", len(result), args.out)
+    else:
+        print(result.to_string(index=False))
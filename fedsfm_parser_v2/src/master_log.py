@@ -0,0 +1,236 @@
+"""
+Мастер-список РФМ как журнал событий.
+
+    rfm_master_events.jsonl   — только дописывается: по строке JSON на событие
+                                {"date", "op": "added"/"removed", "ID", "row"}
+    rfm_master_current.json   — текущее состояние: ID → строка + «Дата добавления»
+                                и размер журнала, до которого оно доведено
+
+Запуск читает текущее состояние и хвост журнала после него (размер списка,
+а не всей истории) и дописывает в журнал только изменения. Состояние
+атомарно (tmp + replace) перезаписывается, только когда хвост журнала,
+ещё не вошедший в него, больше VIEW_REWRITE_SHARE его размера, — запись
+в среднем пропорциональна изменениям. Недописанная после сбоя последняя
+строка журнала отрезается.
+
+Человек, исключённый из списка и потом снова включённый, получает новое
+событие «added» — в полной таблице это отдельный период (раньше ID оставался
+с датой удаления навсегда).
+
+Полная таблица в старом формате (rfm_master.csv, с «Дата добавления» /
+«Дата удаления») собирается из журнала по запросу — materialize().
+Прежний rfm_master.csv после переноса в журнал переименовывается
+в rfm_master.imported.csv, чтобы его не читали как актуальный.
+"""
+
+from __future__ import annotations
+
+import json, logging, os
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from config import MASTER_EVENTS_FILE, MASTER_FILE, MASTER_VIEW_FILE
+from utils import atomic_write
+
+DATE_FORMAT = "%Y-%m-%d"
+ADDED_COLUMN = "Дата добавления"
+REMOVED_COLUMN = "Дата удаления"
+# состояние перезаписывается, когда непримененный хвост журнала больше этой доли его размера
+VIEW_REWRITE_SHARE = 0.25
+
+
+class MasterLog:
+    def __init__(self, events_file: Path = MASTER_EVENTS_FILE,
+                 view_file: Path = MASTER_VIEW_FILE, legacy_file: Path = MASTER_FILE):
+        self.events_file = Path(events_file)
+        self.view_file = Path(view_file)
+        self.legacy_file = Path(legacy_file)
+        self._view_saved = (0, 0)      # (log_size в файле состояния, размер файла)
+
+    # ---------- чтение ----------
+    def iter_events(self, offset: int = 0):
+        """События журнала начиная с байтового смещения `offset`."""
+        if not self.events_file.exists():
+            return
+        with open(self.events_file, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break       # недописанная строка — её отрежет _repair_tail
+                yield json.loads(line)
+
+    def size(self) -> int:
+        """Размер журнала в байтах (смещение, после которого пойдут новые события)."""
+        return self._repair_tail()
+
+    def current(self) -> dict:
+        """
+        Текущее состояние {"log_size": int, "rows": {ID: row}}; если журнал
+        длиннее, чем зафиксировано в состоянии, — догоняет его по хвосту.
+        """
+        self._bootstrap()
+        view = {"log_size": 0, "rows": {}}
+        self._view_saved = (0, 0)
+        if self.view_file.exists():
+            try:
+                with open(self.view_file, encoding="utf-8") as f:
+                    view = json.load(f)
+                self._view_saved = (view["log_size"], self.view_file.stat().st_size)
+            except Exception as e:
+                logging.warning("Cannot read %s: %s – rebuilding from %s",
+                                self.view_file, e, self.events_file)
+
+        size = self._repair_tail()
+        if view["log_size"] > size:     # состояние новее журнала — не доверяем
+            view = {"log_size": 0, "rows": {}}
+            self._view_saved = (0, 0)
+        if view["log_size"] < size:
+            for event in self.iter_events(view["log_size"]):
+                self._apply(view["rows"], event)
+            view["log_size"] = size
+            self._maybe_save_view(view)
+        return view
+
+    def current_df(self) -> pd.DataFrame:
+        return pd.DataFrame(list(self.current()["rows"].values()))
+
+    def materialize(self, path: Path = None) -> Path:
+        """
+        Полная таблица в старом формате rfm_master.csv: по строке на каждый
+        период нахождения в списке.
+        """
+        path = Path(path or self.legacy_file)
+        self._bootstrap()
+        self._repair_tail()
+        rows, open_rows = [], {}
+        for event in self.iter_events():
+            if event["op"] == "added":
+                row = dict(event["row"], **{ADDED_COLUMN: event["date"], REMOVED_COLUMN: ""})
+                open_rows[event["ID"]] = row
+                rows.append(row)
+            elif event["ID"] in open_rows:
+                open_rows.pop(event["ID"])[REMOVED_COLUMN] = event["date"]
+
+        df = pd.DataFrame(rows)
+        if len(df):
+            df = df[[c for c in df.columns if c not in (ADDED_COLUMN, REMOVED_COLUMN)]
+                    + [ADDED_COLUMN, REMOVED_COLUMN]]
+        atomic_write(path, df.to_csv(index=False))
+        logging.info("Master table materialized: %s (%d rows)", path, len(df))
+        return path
+
+    # ---------- запись ----------
+    def update(self, new_df: pd.DataFrame, ts: datetime) -> list:
+        """
+        Записывает в журнал добавленные и удалённые относительно текущего
+        состояния ID. Возвращает список записанных событий.
+        """
+        view = self.current()
+        active = view["rows"]
+        date = ts.strftime(DATE_FORMAT)
+
+        new_df = new_df.fillna("").astype(str)
+        is_added = ~new_df["ID"].isin(active.keys())
+        new_ids = set(new_df["ID"])
+
+        events = [{"date": date, "op": "added", "ID": row["ID"], "row": row}
+                  for row in new_df[is_added].to_dict("records")]
+        events += [{"date": date, "op": "removed", "ID": id_}
+                   for id_ in active if id_ not in new_ids]
+        if not events:
+            return events
+
+        view["log_size"] = self._append(events)
+        for event in events:
+            self._apply(active, event)
+        self._maybe_save_view(view)
+        return events
+
+    # ---------- внутреннее ----------
+    @staticmethod
+    def _apply(rows: dict, event: dict) -> None:
+        if event["op"] == "added":
+            rows[event["ID"]] = dict(event["row"], **{ADDED_COLUMN: event["date"]})
+        else:
+            rows.pop(event["ID"], None)
+
+    def _append(self, events) -> int:
+        """Дописывает события одной записью с fsync; возвращает новый размер журнала."""
+        data = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events)
+        with open(self.events_file, "ab") as f:
+            f.write(data.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+            return f.tell()
+
+    def _maybe_save_view(self, view: dict) -> None:
+        """
+        Перезаписывает состояние, только если его нет или хвост журнала после
+        него вырос больше VIEW_REWRITE_SHARE размера состояния; иначе хвост
+        догоняется при следующем чтении.
+        """
+        saved_log_size, saved_bytes = self._view_saved
+        if saved_bytes and view["log_size"] - saved_log_size <= VIEW_REWRITE_SHARE * saved_bytes:
+            return
+        self._save_view(view)
+
+    def _save_view(self, view: dict) -> None:
+        data = json.dumps(view, ensure_ascii=False)
+        atomic_write(self.view_file, data)
+        self._view_saved = (view["log_size"], len(data.encode("utf-8")))
+
+    def _repair_tail(self) -> int:
+        """Отрезает недописанную последнюю строку журнала; возвращает его размер."""
+        if not self.events_file.exists():
+            return 0
+        with open(self.events_file, "r+b") as f:
+            size = f.seek(0, os.SEEK_END)
+            if not size:
+                return 0
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) == b"\n":
+                return size
+            # сбой посреди записи — редкость, можно прочитать журнал целиком
+            f.seek(0)
+            cut = f.read().rfind(b"\n") + 1
+            f.truncate(cut)
+        logging.warning("Master log %s: truncated incomplete record (%d → %d bytes)",
+                        self.events_file, size, cut)
+        return cut
+
+    def _bootstrap(self) -> None:
+        """Однократный перенос старого rfm_master.csv в журнал."""
+        if self.events_file.exists() or not self.legacy_file.exists():
+            return
+        master = pd.read_csv(self.legacy_file, dtype=str, keep_default_na=False)
+        data_columns = [c for c in master.columns if c not in (ADDED_COLUMN, REMOVED_COLUMN)]
+        events = []
+        for row in master.to_dict("records"):
+            added, removed = row.get(ADDED_COLUMN, ""), row.get(REMOVED_COLUMN, "")
+            events.append({"date": added, "op": "added", "ID": row["ID"],
+                           "row": {c: row[c] for c in data_columns}})
+            if removed:
+                events.append({"date": removed, "op": "removed", "ID": row["ID"]})
+        # по датам; при равной дате добавление раньше удаления
+        events.sort(key=lambda e: (e["date"], e["op"] != "added"))
+
+        atomic_write(self.events_file, "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events))
+        self.view_file.unlink(missing_ok=True)
+        # старая таблица больше не обновляется — чтобы её не читали как актуальную
+        imported = self.legacy_file.with_name(f"{self.legacy_file.stem}.imported{self.legacy_file.suffix}")
+        self.legacy_file.replace(imported)
+        logging.info("Master log bootstrapped from %s: %d events; the old table is kept as %s, "
+                     "the current full table is built by materialize() (python master_log.py)",
+                     self.legacy_file, len(events), imported)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    # Выгрузка полной таблицы в старом формате:
+    #   python master_log.py [out.csv]
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    print(MasterLog().materialize(sys.argv[1] if len(sys.argv) > 1 else None))
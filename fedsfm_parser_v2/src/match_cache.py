@@ -0,0 +1,111 @@
+"""
+Кэш результатов сравнения пар RFM ↔ Airtable между запусками (SQLite).
+
+Ключ — хэши содержимого строки РФМ и строки Airtable (только того, что
+влияет на сравнение, см. MatchFeatures.content_key) и версия сравнения
+(MATCHER_VERSION + версия справочника регионов). Пара, у которой не
+изменилась ни одна сторона, второй раз не считается.
+
+Размер ограничен: у каждой записи номер запуска, в котором она последний
+раз использовалась; сверх max_rows удаляются давно не использованные (LRU).
+"""
+
+from __future__ import annotations
+
+import logging, sqlite3
+from pathlib import Path
+
+from config import PAIR_CACHE_FILE, PAIR_CACHE_MAX_ROWS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pairs (
+    rfm_hash INTEGER NOT NULL,
+    air_hash INTEGER NOT NULL,
+    version  TEXT NOT NULL,
+    type     TEXT NOT NULL,
+    score    REAL NOT NULL,
+    used     INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_pairs_key ON pairs(rfm_hash, air_hash, version);
+CREATE INDEX IF NOT EXISTS ix_pairs_used ON pairs(used);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class PairCache:
+    def __init__(self, version: str, path: Path = PAIR_CACHE_FILE, max_rows: int = PAIR_CACHE_MAX_ROWS):
+        self.version = version
+        self.path = Path(path)
+        self.max_rows = max_rows
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript(SCHEMA)
+        with self.conn:
+            # записи другой версии сравнения уже никогда не совпадут
+            stale = self.conn.execute("DELETE FROM pairs WHERE version != ?", (version,)).rowcount
+            self.run = int(self._meta("run") or 0) + 1
+            self._set_meta("run", self.run)
+        if stale:
+            logging.info("Pair cache: %d entries of other matcher versions removed", stale)
+        self.hits = self.misses = 0
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def lookup(self, keys) -> dict:
+        """
+        `keys` — пары (rfm_hash, air_hash) → {пара: (тип, score)} для найденных;
+        найденные помечаются как использованные в этом запуске.
+        """
+        keys = list(dict.fromkeys(keys))
+        cur = self.conn.cursor()
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS q (rfm_hash INTEGER, air_hash INTEGER)")
+        cur.execute("DELETE FROM q")
+        cur.executemany("INSERT INTO q VALUES (?, ?)", keys)
+        found = {
+            (r, a): (t, s) for r, a, t, s in cur.execute(
+                "SELECT p.rfm_hash, p.air_hash, p.type, p.score FROM q "
+                "JOIN pairs p ON p.rfm_hash = q.rfm_hash AND p.air_hash = q.air_hash AND p.version = ?",
+                (self.version,))
+        }
+        with self.conn:
+            self.conn.execute(
+                "UPDATE pairs SET used = ? WHERE version = ? AND (rfm_hash, air_hash) IN (SELECT rfm_hash, air_hash FROM q)",
+                (self.run, self.version))
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def store(self, items) -> None:
+        """`items` — ((rfm_hash, air_hash), тип, score); затем вытеснение сверх max_rows."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pairs (rfm_hash, air_hash, version, type, score, used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                ((r, a, self.version, t, float(s), self.run) for (r, a), t, s in items))
+            extra = self.size() - self.max_rows
+            if extra > 0:
+                self.conn.execute(
+                    "DELETE FROM pairs WHERE rowid IN (SELECT rowid FROM pairs ORDER BY used LIMIT ?)", (extra,))
+                logging.info("Pair cache: %d least recently used entries evicted", extra)
+
+    def size(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM pairs").fetchone()[0]
+
+    def log_stats(self) -> None:
+        total = self.hits + self.misses
+        logging.info("Pair cache: %d/%d hits (%.1f%%), %d entries in %s", self.hits, total,
+                     100 * self.hits / max(1, total), self.size(), self.path)
+
+    # ---------- внутреннее ----------
+    def _meta(self, key: str):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
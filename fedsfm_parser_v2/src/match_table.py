@@ -0,0 +1,46 @@
+"""
+Таблица совпадений полного сравнения (compare_all_mapped) прошлого запуска —
+основа инкрементального режима.
+
+    {"version": версия сравнения,
+     "air":  [[_air_id, хэш строки], ...]   — строки Airtable в порядке таблицы
+     "rows": {хэш строки РФМ: _air_id лучшего «full» или null}}
+
+По ней следующий запуск сравнивает заново только изменившиеся строки РФМ,
+а остальные — только с новыми и изменёнными строками Airtable
+(см. compare_airtable.incremental_blocks).
+"""
+
+from __future__ import annotations
+
+import json, logging
+from pathlib import Path
+
+from config import MATCH_TABLE_FILE
+from utils import atomic_write
+
+
+class MatchTable:
+    def __init__(self, path: Path = MATCH_TABLE_FILE):
+        self.path = Path(path)
+
+    def load(self, version: str) -> dict | None:
+        """Таблица прошлого запуска той же версии сравнения или None."""
+        if not self.path.exists():
+            return None
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                table = json.load(f)
+        except Exception as e:
+            logging.warning("Cannot read match table %s: %s", self.path, e)
+            return None
+        if table.get("version") != version:
+            logging.info("Match table %s is for another matcher version – ignored", self.path)
+            return None
+        return table
+
+    def save(self, version: str, air, rows: dict) -> None:
+        table = {"version": version, "air": [list(a) for a in air], "rows": rows}
+        atomic_write(self.path, json.dumps(table, ensure_ascii=False))
+        logging.info("Match table saved: %s (%d RFM rows, %d matched)", self.path, len(rows),
+                     sum(v is not None for v in rows.values()))
@@ -2,15 +2,25 @@ import logging
 from pathlib import Path
 
 
-def _clean(folder: Path, ext: str, keep_count: int):
-    files = sorted(folder.glob(ext), key=lambda p: p.stat().st_mtime, reverse=True)
+def _clean(folder: Path, ext: str, keep_count: int, manifest=None):
+    # файлы, известные манифесту, упорядочены по времени из имени; остальные — по mtime
+    files = manifest.files(folder, ext) if manifest is not None else None
+    if files is None:
+        files = sorted(folder.glob(ext), key=lambda p: p.stat().st_mtime, reverse=True)
     for f in files[keep_count:]:
         try:
-            f.unlink()
+            f.unlink(missing_ok=True)
+            if manifest is not None:
+                manifest.forget(f, save=False)
         except Exception as e:
             logging.warning("Cannot delete %s: %s", f, e)
 
-def clean_folders(folders_res: "tuple[str, str]", keep_count = 10):
+def clean_folders(folders_res: "tuple[str, str]", keep_count = 10, manifest=None):
+    """
+    :param manifest:  manifest.Manifest — брать списки файлов из него, без glob/stat
+    """
     for folder, res in folders_res:
-        _clean(folder, res, keep_count)
+        _clean(folder, res, keep_count, manifest)
+    if manifest is not None:
+        manifest.save()
 
@@ -0,0 +1,239 @@
+"""
+Справочник регионов (regions_dict.csv), скомпилированный для поиска
+в свободном тексте РФМ («Остальные данные»).
+
+Для каждого региона берутся название и все «Варианты в файле» в
+нормализованном виде (utils.normalize_text). Вариант считается найденным в
+тексте, если его токены входят в токены текста (или наоборот) — ровно тот
+случай, когда fuzz.token_set_ratio(текст, вариант) == 100 в match_quality.
+Поиск — по инвертированным индексам: вариант проверяется, только если в
+тексте есть его самый редкий токен (вариант ⊆ текст) или он содержит самый
+редкий токен текста (текст ⊆ вариант); частые токены вроде ОБЛАСТИ или
+РАЙОНА списков в тысячи вариантов не раскрывают. Результат по тексту
+запоминается.
+
+RegionScorer — нечёткая похожесть текста на каждый регион справочника
+(максимум token_set_ratio по его вариантам), по вектору на уникальный
+текст; векторы кэшируются на диске для текущей версии справочника.
+"""
+
+from __future__ import annotations
+
+import hashlib, logging
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz, process
+
+from config import REGION_SCORES_FILE, SRC_DIR
+from utils import normalize_text
+
+REGIONS_FILE = SRC_DIR / "regions_dict.csv"
+REGION_IDS_COLUMN = "Регионы (ID)"      # ID регионов, найденных в «Остальных данных»
+REGION_IDS_SEP = ";"
+
+
+def read_region_dict(path: Path = REGIONS_FILE) -> dict:
+    """id → (название из справочника, [варианты написания в файле РФМ])."""
+    df = pd.read_csv(path, dtype=str, sep=",", keep_default_na=False)
+    return {
+        region_id: (name, [v.strip() for v in variants.split(";") if v.strip()])
+        for region_id, name, variants in zip(df["id"], df["Регион (справочник)"], df["Варианты в файле"])
+    }
+
+
+def file_version(path: Path = REGIONS_FILE) -> str:
+    """Хэш содержимого справочника — ключ для всего, что из него вычислено."""
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()[:16]
+
+
+class RegionGazetteer:
+    def __init__(self, region_dict: dict, version: str = ""):
+        self.version = version
+        self.region_ids = list(region_dict)
+        # нормализованные варианты: [(id региона, текст, число уникальных токенов)]
+        self.variants = []
+        self._variant_tokens = []   # номер варианта → его токены
+        self._token_index = {}      # токен → [номер варианта] (все варианты с токеном)
+        for region_id, (name, options) in region_dict.items():
+            for option in [name, *options]:
+                text = normalize_text(option)
+                tokens = frozenset(text.split())
+                if not tokens:
+                    continue
+                n = len(self.variants)
+                self.variants.append((region_id, text, len(tokens)))
+                self._variant_tokens.append(tokens)
+                for token in tokens:
+                    self._token_index.setdefault(token, []).append(n)
+        # каждый вариант — только под своим самым редким токеном: частые
+        # токены (ОБЛАСТИ, РАЙОНА, Г.) есть у тысяч вариантов, но редко
+        # бывают самым редким токеном варианта
+        df = {token: len(ns) for token, ns in self._token_index.items()}
+        self._rare_index = {}       # токен → [номер варианта, у которого он самый редкий]
+        for n, tokens in enumerate(self._variant_tokens):
+            rarest = min(tokens, key=lambda t: (df[t], t))
+            self._rare_index.setdefault(rarest, []).append(n)
+        self._memo = {}             # исходный текст → найденные ID
+
+    def variants_of(self, region_id: str):
+        return [text for rid, text, _ in self.variants if rid == region_id]
+
+    def extract(self, text) -> set:
+        """ID регионов, варианты которых входят в `text` (или `text` — в них)."""
+        if not isinstance(text, str):
+            return set()
+        found = self._memo.get(text)
+        if found is None:
+            found = self._memo[text] = frozenset(self._extract(text))
+        return set(found)
+
+    def _extract(self, text: str) -> set:
+        tokens = set(normalize_text(text).split())
+        if not tokens:
+            return set()
+        found = set()
+        # вариант входит в текст: его самый редкий токен есть в тексте
+        for token in tokens:
+            for n in self._rare_index.get(token, ()):
+                if self._variant_tokens[n] <= tokens:
+                    found.add(self.variants[n][0])
+        # текст входит в вариант: кандидаты — варианты с самым редким токеном текста
+        postings = [self._token_index.get(token) for token in tokens]
+        if all(postings):
+            for n in min(postings, key=len):
+                if tokens <= self._variant_tokens[n]:
+                    found.add(self.variants[n][0])
+        return found
+
+    def extract_column(self, texts: pd.Series) -> pd.Series:
+        """Колонка REGION_IDS_COLUMN для серии текстов (каждый уникальный текст — один раз)."""
+        found = {text: REGION_IDS_SEP.join(sorted(self.extract(text))) for text in texts.unique()}
+        return texts.map(found)
+
+
+@lru_cache(maxsize=None)
+def get_gazetteer() -> RegionGazetteer:
+    return RegionGazetteer(read_region_dict(), file_version())
+
+
+class RegionScorer:
+    """
+    Похожесть текста на регионы справочника:
+    score(text, ids) == max(fuzz.token_set_ratio(normalize_text(text), вариант)
+    по всем вариантам регионов ids) — то же, что считает match_quality для
+    каждой пары, но каждая пара (текст, регион) считается один раз.
+    Для каждого уникального текста хранится вектор по регионам (NaN — ещё
+    не посчитано); prime() заполняет векторы пачки текстов одним cdist.
+    """
+
+    def __init__(self, gazetteer: RegionGazetteer, path: Path = REGION_SCORES_FILE):
+        self.gazetteer = gazetteer
+        self.path = Path(path)
+        self.position = {rid: i for i, rid in enumerate(gazetteer.region_ids)}
+        self._variant_texts = [text for _, text, _ in gazetteer.variants]
+        self._variant_region = np.array([self.position[rid] for rid, _, _ in gazetteer.variants], dtype=np.intp)
+        self._region_variants = [[] for _ in self.position]
+        for rid, text, _ in gazetteer.variants:
+            self._region_variants[self.position[rid]].append(text)
+        self._vectors = {}      # нормализованный текст → вектор по регионам
+        self._raw = {}          # исходный текст → тот же вектор
+        self.hits = self.misses = 0
+        self._load()
+
+    def _vector(self, text) -> np.ndarray:
+        vector = self._raw.get(text) if isinstance(text, str) else None
+        if vector is None:
+            norm = normalize_text(text)
+            vector = self._vectors.get(norm)
+            if vector is None:
+                vector = self._vectors[norm] = np.full(len(self.position), np.nan)
+            if isinstance(text, str):
+                self._raw[text] = vector
+        return vector
+
+    def score(self, text, region_ids) -> float:
+        """Лучшая похожесть текста на любой из регионов `region_ids` (0 — если их нет)."""
+        best = 0
+        if not region_ids:
+            return best
+        vector = self._vector(text)
+        for rid in region_ids:
+            pos = self.position[rid]
+            value = vector[pos]
+            if value != value:      # NaN — пара ещё не считалась
+                self.misses += 1
+                norm = normalize_text(text)
+                value = vector[pos] = max(
+                    (fuzz.token_set_ratio(norm, variant) for variant in self._region_variants[pos]),
+                    default=0,
+                )
+            else:
+                self.hits += 1
+            best = max(best, value)
+        return float(best)
+
+    def prime(self, texts) -> None:
+        """Досчитывает векторы пачки текстов одним вызовом cdist по всем вариантам."""
+        vectors = {id(v): v for v in map(self._vector, texts) if np.isnan(v).any()}
+        if not vectors:
+            return
+        norms = [t for t, v in self._vectors.items() if id(v) in vectors]
+        # float64 — значения ровно те же, что у fuzz.token_set_ratio
+        matrix = process.cdist(norms, self._variant_texts, scorer=fuzz.token_set_ratio,
+                               dtype=np.float64, workers=-1)
+        per_region = np.zeros((len(norms), len(self.position)))
+        np.maximum.at(per_region.T, self._variant_region, matrix.T)
+        for norm, row in zip(norms, per_region):
+            self._vectors[norm][:] = row
+
+    def matrix(self, texts) -> np.ndarray:
+        """Векторы текстов строками матрицы len(texts) × число регионов."""
+        texts = list(texts)
+        self.prime(texts)
+        if not texts:
+            return np.zeros((0, len(self.position)))
+        return np.stack([self._vector(t) for t in texts])
+
+    # ---------- кэш на диске ----------
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if str(data["version"]) != self.gazetteer.version or \
+                        list(data["region_ids"]) != self.gazetteer.region_ids:
+                    logging.info("Region scores cache %s is for another regions_dict.csv – ignored", self.path)
+                    return
+                self._vectors = dict(zip(data["texts"].tolist(), data["scores"]))
+        except Exception as e:
+            logging.warning("Cannot read %s: %s", self.path, e)
+            self._vectors = {}
+
+    def save(self) -> None:
+        """Сохраняет векторы текстов, встретившихся в этом запуске (кэш не растёт)."""
+        used = {id(v) for v in self._raw.values()}
+        texts = [t for t, v in self._vectors.items() if id(v) in used]
+        scores = np.array([self._vectors[t] for t in texts]).reshape(len(texts), len(self.position))
+        tmp = self.path.with_name(self.path.stem + ".tmp.npz")
+        np.savez_compressed(tmp, version=self.gazetteer.version,
+                            region_ids=np.array(self.gazetteer.region_ids),
+                            texts=np.array(texts, dtype=str), scores=scores)
+        tmp.replace(self.path)
+        logging.info("Region scores: %d hits, %d computed, %d texts cached", self.hits, self.misses, len(texts))
+
+
+@lru_cache(maxsize=None)
+def get_region_scorer() -> RegionScorer:
+    return RegionScorer(get_gazetteer())
+
+
+def parse_region_ids(value) -> set | None:
+    """Значение REGION_IDS_COLUMN → множество ID; None — колонки нет (старый снимок)."""
+    if value is None:
+        return None
+    if not isinstance(value, str):      # пустая ячейка CSV
+        return set()
+    return {v for v in value.split(REGION_IDS_SEP) if v}
@@ -1,90 +1,722 @@
-import logging, re, requests, pandas as pd
+import hashlib, json, logging, re, requests, pandas as pd
+from collections import deque
+from html.parser import HTMLParser
+from pathlib import Path
 from bs4 import BeautifulSoup
-from config import PARSE_URL
+from config import FETCH_STATE_FILE, PARSE_CACHE_FILE, PARSE_URL, RFM_SECTIONS
+from regions import REGION_IDS_COLUMN, get_gazetteer
 from utils import clean_field, generate_record_id
 
+RFM_SECTION_ID = "russianFL"
+RFM_COLUMNS = [
+    "ID",
+    "Порядковый номер",
+    "Имя",
+    "Доп Имя",
+    "Дата рождения",
+    "Остальные данные",
+    "Террорист",
+    "Изначальный текст",
+]
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# теги без закрывающей пары и теги, текст которых get_text() не учитывает
+_VOID_TAGS = {
+    "area", "base", "basefont", "bgsound", "br", "col", "command", "embed",
+    "frame", "hr", "image", "img", "input", "isindex", "keygen", "link",
+    "menuitem", "meta", "nextid", "param", "source", "spacer", "track", "wbr",
+}
+_SKIP_TEXT_TAGS = {"script", "style", "template", "rt", "rp"}
+
 # ─────────────────────────────────────────────────────────────────────────────
+_NUM_RE = re.compile(r"(\d+)\.")
+_DOB_RE = re.compile(r"(\d{2}\.\d{2}\.\d{4}) г\.р\.")
+# один проход по строке: дата рождения или псевдоним в скобках
+_TOKEN_RE = re.compile(r"(?P<dob>(?P<date>\d{2}\.\d{2}\.\d{4}) г\.р\.)|\((?P<alias>[^()]*)\)")
+
+
 def _parse_person_text(text: str):
     """
-    Разбор одной строки РФМ-списка → кортеж значений.
+    Разбор одной строки РФМ-списка → кортеж значений
+    (number, name, alias, birth, other, terrorist, text).
     """
     terrorist = "*" in text
 
-    text = re.sub(r'[\r\n]+', ' ', text)
-    text = re.sub(r'\s+', ' ', text).strip()
+    # эквивалент re.sub(r"[\r\n]+"…) + re.sub(r"\s+", " ", …).strip()
+    text = " ".join(text.split())
 
-    num_match = re.match(r"(\d+)\.", text)
-    number = num_match.group(1) if num_match else "-"
-
-    body = text[num_match.end():].strip() if num_match else text.strip()
+    num_match = _NUM_RE.match(text)
+    if num_match:
+        number = num_match.group(1)
+        body = text[num_match.end():].strip()
+    else:
+        number = "-"
+        body = text
 
-    dob_match = re.search(r"(\d{2}\.\d{2}\.\d{4}) г\.р\.", body)
-    birth = dob_match.group(1) if dob_match else "-"
+    # первые вхождения даты и псевдонима; дата может оказаться внутри скобок
+    dob_full = dob_date = alias_full = alias_text = None
+    dob_end = 0
+    for m in _TOKEN_RE.finditer(body):
+        if m.group("dob") is not None:
+            if dob_full is None:
+                dob_full, dob_date, dob_end = m.group(0), m.group("date"), m.end()
+        else:
+            if alias_full is None:
+                alias_full, alias_text = m.group(0), m.group("alias")
+            if dob_full is None:
+                inner = _DOB_RE.search(body, m.start(), m.end())
+                if inner:
+                    dob_full, dob_date, dob_end = inner.group(0), inner.group(1), inner.end()
+        if dob_full is not None and alias_full is not None:
+            break
 
-    alias_match = re.search(r"\(([^()]*)\)", body)
-    alias = clean_field(alias_match.group(1)) if alias_match else "-"
+    alias = clean_field(alias_text) if alias_full is not None else "-"
 
     cleaned = body
-    if alias_match:
-        cleaned = cleaned.replace(alias_match.group(0), "")
-    if dob_match:
-        cleaned = cleaned.replace(dob_match.group(0), "")
+    if alias_full is not None:
+        cleaned = cleaned.replace(alias_full, "")
+    if dob_full is not None:
+        cleaned = cleaned.replace(dob_full, "")
 
-    parts = [p.strip() for p in cleaned.split(",") if p.strip()]
+    parts = [p for p in map(str.strip, cleaned.split(",")) if p]
     name = clean_field(parts[0].replace("*", "")) if parts else "-"
 
-    other = ""
-    if dob_match:
-        other = body[dob_match.end():].strip()
+    if dob_full is not None:
+        other = body[dob_end:].strip()
     elif len(parts) > 1:
         other = ", ".join(parts[1:]).strip()
+    else:
+        other = ""
     other = clean_field(other) or "-"
 
-    birth = clean_field(birth)
+    # дата всегда начинается и заканчивается цифрой — clean_field её не меняет
+    birth = dob_date if dob_full is not None else "-"
     return number, name, alias, birth, other, terrorist, text
 
+
+def parse_batch(lines) -> list:
+    """
+    Разбор списка строк РФМ → список кортежей, как у _parse_person_text.
+    """
+    parse = _parse_person_text
+    return [parse(line) for line in lines]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+_INN_RE = re.compile(r"ИНН:?\s*(\d{10,12})")
+_OGRN_RE = re.compile(r"ОГРН:?\s*(\d{13,15})")
+_ALIAS_RE = re.compile(r"\(([^()]*)\)")
+
+
+def _parse_org_text(text: str):
+    """
+    Разбор одной строки списка организаций → кортеж значений
+    (number, name, alias, inn, ogrn, other, terrorist, text).
+    """
+    terrorist = "*" in text
+    text = " ".join(text.split())
+
+    num_match = _NUM_RE.match(text)
+    number = num_match.group(1) if num_match else "-"
+    body = text[num_match.end():].strip() if num_match else text
+
+    alias_match = _ALIAS_RE.search(body)
+    inn_match = _INN_RE.search(body)
+    ogrn_match = _OGRN_RE.search(body)
+
+    cleaned = body
+    for m in (alias_match, inn_match, ogrn_match):
+        if m:
+            cleaned = cleaned.replace(m.group(0), "")
+
+    parts = [p for p in map(str.strip, cleaned.split(",")) if p]
+    # кавычки «» — часть наименования, поэтому clean_field здесь не подходит
+    name = parts[0].replace("*", "").strip(" ,;") if parts else ""
+    other = ", ".join(parts[1:]).strip(" ,;")
+
+    alias = clean_field(alias_match.group(1)) if alias_match else "-"
+    inn = inn_match.group(1) if inn_match else "-"
+    ogrn = ogrn_match.group(1) if ogrn_match else "-"
+    return number, name or "-", alias or "-", inn, ogrn, other or "-", terrorist, text
+
+# ─────────────────────────────────────────────────────────────────────────────
+class _SectionItemsParser(HTMLParser):
+    """
+    Потоковый разбор HTML: собирает тексты <li> внутри элементов с заданными id.
+    Результат для каждой секции совпадает с `soup.select_one("#id").find_all("li")`
+    + `li.get_text(strip=True)` парсера BeautifulSoup (html.parser).
+    """
+
+    def __init__(self, section_ids):
+        super().__init__(convert_charrefs=True)
+        self.pending = set(section_ids)   # ещё не встреченные секции
+        self.found = []                   # встреченные секции по порядку
+        self.current = None               # id открытой сейчас секции
+        self._stack = []        # открытые теги внутри секции
+        self._items = deque()   # [части текста, закрыт ли <li>, id секции] в порядке открытия
+        self._open_items = []   # (глубина в стеке, элемент _items)
+        self._data = []
+        self._skip_depth = 0
+
+    @property
+    def done(self) -> bool:
+        """Все секции прочитаны — дальше документ можно не читать."""
+        return not self.pending and self.current is None
+
+    # ---------- события парсера ----------
+    def handle_starttag(self, tag, attrs):
+        if self.current is None:
+            if self.pending and tag not in _VOID_TAGS:
+                section_id = dict(attrs).get("id")
+                if section_id in self.pending:
+                    self.pending.discard(section_id)
+                    self.found.append(section_id)
+                    self.current = section_id
+                    self._stack.append(tag)
+            return
+
+        self._flush_data()
+        if tag in _VOID_TAGS:
+            return
+        self._stack.append(tag)
+        if tag in _SKIP_TEXT_TAGS:
+            self._skip_depth += 1
+        if tag == "li":
+            item = [[], False, self.current]
+            self._items.append(item)
+            self._open_items.append((len(self._stack), item))
+
+    def handle_startendtag(self, tag, attrs):
+        # <tag/> — пустой элемент, текста не содержит
+        if self.current is not None:
+            self._flush_data()
+
+    def handle_endtag(self, tag):
+        if self.current is None:
+            return
+        self._flush_data()
+        if tag not in self._stack:
+            return          # как и BeautifulSoup, игнорируем непарные теги
+        while self._stack:
+            if self._pop() == tag:
+                break
+        if not self._stack:
+            self.current = None
+
+    def handle_data(self, data):
+        if self.current is not None and not self._skip_depth:
+            self._data.append(data)
+
+    def handle_comment(self, data):
+        # комментарий разрывает текст на две отдельные строки
+        if self.current is not None:
+            self._flush_data()
+
+    handle_decl = handle_pi = unknown_decl = handle_comment
+
+    def close(self):
+        super().close()
+        if self.current is not None:
+            # документ закончился раньше секции — закрываем всё, как BeautifulSoup
+            self._flush_data()
+            while self._stack:
+                self._pop()
+            self.current = None
+
+    # ---------- внутреннее ----------
+    def _pop(self) -> str:
+        tag = self._stack.pop()
+        if tag in _SKIP_TEXT_TAGS:
+            self._skip_depth -= 1
+        if self._open_items and self._open_items[-1][0] > len(self._stack):
+            self._open_items.pop()[1][1] = True
+        return tag
+
+    def _flush_data(self):
+        if not self._data:
+            return
+        text = "".join(self._data).strip()
+        self._data = []
+        if text:
+            for _, item in self._open_items:
+                item[0].append(text)
+
+    def pop_items(self):
+        """
+        Готовые (id секции, текст <li>) по порядку документа.
+        """
+        ready = []
+        while self._items and self._items[0][1]:
+            parts, _, section_id = self._items.popleft()
+            ready.append((section_id, "".join(parts)))
+        return ready
+
+
+def iter_sections_items(chunks, section_ids, required=(), found=None):
+    """
+    Генератор пар (id секции, текст <li>) для нескольких секций за один
+    проход по потоку кусков HTML. Чтение прекращается, как только все
+    секции прочитаны. Отсутствие секции из `required` — ValueError,
+    остальных — предупреждение в лог.
+    :param found:  список, в который дописываются id встреченных секций
+    """
+    parser = _SectionItemsParser(section_ids)
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.pop_items()
+        if parser.done:
+            break
+    else:
+        parser.close()
+        yield from parser.pop_items()
+
+    if found is not None:
+        found.extend(parser.found)
+    for section_id in section_ids:
+        if section_id in parser.pending:
+            if section_id in required:
+                raise ValueError(f"Секция #{section_id} не найдена")
+            logging.warning("Секция #%s не найдена", section_id)
+
+
+def iter_section_items(chunks, section_id: str = RFM_SECTION_ID):
+    """
+    Генератор текстов <li> секции `#section_id` из потока кусков HTML.
+    Чтение прекращается, как только секция закрылась.
+    """
+    for _, text in iter_sections_items(chunks, [section_id], required=[section_id]):
+        yield text
+
+# ─────────────────────────────────────────────────────────────────────────────
+class RfmSection:
+    """
+    Описание секции страницы РФМ: колонки DataFrame, разбор строки,
+    поля для ID записи, колонки для diff и имена файлов.
+    `parse` возвращает кортеж значений колонок columns[1:] — последним
+    всегда идёт нормализованный «Изначальный текст».
+    `derived` — {колонка: функция(DataFrame) → Series}: колонки, которые
+    вычисляются по уже собранному DataFrame и добавляются после columns.
+    `derived_version` — функция → строка, версия данных, от которых зависят
+    derived (входит в ключ ParseCache, где они тоже хранятся).
+    """
+
+    def __init__(
+        self,
+        section_id: str,
+        title: str,
+        *,
+        columns,
+        parse,
+        id_fields,
+        compare_columns,
+        file_prefix: str,
+        required: bool = False,
+        derived=None,
+        derived_version=None,
+    ):
+        self.section_id = section_id
+        self.title = title
+        self.columns = list(columns)
+        self.parse = parse
+        self.id_fields = id_fields
+        self.compare_columns = list(compare_columns)
+        self.file_prefix = file_prefix
+        self.required = required
+        self.derived = dict(derived or {})
+        self.derived_version = derived_version or (lambda: "")
+
+    @property
+    def cache_file(self) -> Path:
+        if self.file_prefix == "data":
+            return PARSE_CACHE_FILE
+        return PARSE_CACHE_FILE.with_name(f"{PARSE_CACHE_FILE.stem}_{self.file_prefix}.csv")
+
+    def parse_batch(self, lines) -> list:
+        if self.parse is _parse_person_text:
+            return parse_batch(lines)
+        parse = self.parse
+        return [parse(line) for line in lines]
+
+    def record_id(self, parsed, counter: int) -> str:
+        name, key = self.id_fields(parsed)
+        return generate_record_id(name, key, counter)
+
+
+SECTIONS = {}
+
+
+def register_section(section: RfmSection) -> RfmSection:
+    SECTIONS[section.section_id] = section
+    return section
+
+
+ORG_COLUMNS = [
+    "ID",
+    "Порядковый номер",
+    "Наименование",
+    "Доп Наименование",
+    "ИНН",
+    "ОГРН",
+    "Остальные данные",
+    "Террорист",
+    "Изначальный текст",
+]
+
+def _region_ids(df: pd.DataFrame) -> pd.Series:
+    return get_gazetteer().extract_column(df["Остальные данные"])
+
+
+def _regions_version() -> str:
+    return get_gazetteer().version
+
+
+register_section(RfmSection(
+    RFM_SECTION_ID, "Российские физические лица",
+    columns=RFM_COLUMNS,
+    parse=_parse_person_text,
+    id_fields=lambda p: (p[1], p[3]),                 # ФИО, дата рождения
+    compare_columns=["Остальные данные", "Доп Имя", "Террорист"],
+    file_prefix="data",                               # прежние data_*.csv
+    required=True,
+    derived={REGION_IDS_COLUMN: _region_ids},
+    derived_version=_regions_version,
+))
+register_section(RfmSection(
+    "foreignFL", "Иностранные физические лица",
+    columns=RFM_COLUMNS,
+    parse=_parse_person_text,
+    id_fields=lambda p: (p[1], p[3]),
+    compare_columns=["Остальные данные", "Доп Имя", "Террорист"],
+    file_prefix="foreign_fl",
+    derived={REGION_IDS_COLUMN: _region_ids},
+    derived_version=_regions_version,
+))
+register_section(RfmSection(
+    "russianUL", "Российские организации",
+    columns=ORG_COLUMNS,
+    parse=_parse_org_text,
+    id_fields=lambda p: (p[1], p[3]),                 # наименование, ИНН
+    compare_columns=["Остальные данные", "Доп Наименование", "ОГРН", "Террорист"],
+    file_prefix="russian_ul",
+))
+register_section(RfmSection(
+    "foreignUL", "Иностранные организации",
+    columns=ORG_COLUMNS,
+    parse=_parse_org_text,
+    id_fields=lambda p: (p[1], p[3]),
+    compare_columns=["Остальные данные", "Доп Наименование", "ОГРН", "Террорист"],
+    file_prefix="foreign_ul",
+))
+
+
+def configured_section_ids(section_ids=RFM_SECTIONS) -> list:
+    """
+    Секции из настройки RFM_SECTIONS: основной список первым, остальные —
+    в порядке из конфига; неизвестные id пропускаются с предупреждением.
+    """
+    unknown = [sid for sid in section_ids if sid not in SECTIONS]
+    if unknown:
+        logging.warning("RFM_SECTIONS: unknown section ids skipped: %s (known: %s)",
+                        ", ".join(unknown), ", ".join(SECTIONS))
+    return [RFM_SECTION_ID] + [sid for sid in dict.fromkeys(section_ids)
+                               if sid in SECTIONS and sid != RFM_SECTION_ID]
+
 # ─────────────────────────────────────────────────────────────────────────────
-def fetch_rfm_list() -> pd.DataFrame:
-    logging.info("Fetching RFM list…")
+def iter_section_rows(section: RfmSection, texts, cache=None):
+    """
+    Генератор строк DataFrame секции (в порядке section.columns)
+    из текстов <li>.
+    :param cache:  ParseCache — через разбор проходят только строки,
+                   которых не было в прошлом разборе
+    """
+    if cache is None:
+        parsed_rows = section.parse_batch(texts)
+        cached_ids = [None] * len(parsed_rows)
+    else:
+        parsed_rows, cached_ids = cache.parse(texts)
+
+    id_counter = {}
+    for idx, parsed in enumerate(parsed_rows, 1):
+        name, key_value = section.id_fields(parsed)
+        key = (name.lower(), key_value)
+        id_counter[key] = id_counter.get(key, 0) + 1
+        counter = id_counter[key] - 1
+        rec_id = cached_ids[idx - 1]
+        if rec_id is None or rec_id[0] != counter:
+            rec_id = (counter, section.record_id(parsed, counter))
+            cached_ids[idx - 1] = rec_id
+        yield [rec_id[1], *parsed]
+
+        if idx % 100 == 0:
+            logging.info("RFM-парсер (%s): обработано %d записей…", section.section_id, idx)
+
+    if cache is not None:
+        cache.update(parsed_rows, cached_ids)
+
+
+def iter_rfm_persons(texts, cache=None):
+    """
+    Генератор строк будущего DataFrame (в порядке RFM_COLUMNS)
+    из текстов <li> РФМ-списка.
+    """
+    return iter_section_rows(SECTIONS[RFM_SECTION_ID], texts, cache)
+
+
+class ParseCache:
+    """
+    Кэш разбора строк секции РФМ между запусками.
+    Ключ — хэш нормализованной строки («Изначальный текст») и версий разбора
+    и section.derived_version, значение — разобранные поля, производные
+    колонки (section.derived) и ID записи вместе со счётчиком дублей, с
+    которым он был получен (ID переиспользуется, только если счётчик совпал).
+    """
+
+    VERSION = "2"   # менять при любом изменении логики разбора строк или derived
+
+    def __init__(self, section: RfmSection = None):
+        self.section = section or SECTIONS[RFM_SECTION_ID]
+        self.path = self.section.cache_file
+        # всё, кроме ID и «Изначального текста»
+        self.fields = self.section.columns[1:-1]
+        self.derived = list(self.section.derived)
+        self.columns = ["key", *self.fields, *self.derived, "counter", "ID"]
+        self.version = f"{self.VERSION}:{self.section.derived_version()}"
+        self.hits = self.misses = 0
+        self._entries = {}
+        self._keys = []
+        self._derived = []
+        if not self.path.exists():
+            return
+        try:
+            df = pd.read_csv(self.path, dtype=str, keep_default_na=False)
+            terr_idx = self.fields.index("Террорист")
+            n_fields = len(self.fields)
+            # по колонкам списками — быстрее itertuples по строковым колонкам
+            for key, *values, counter, rec_id in zip(*(df[c].tolist() for c in self.columns)):
+                fields, derived = values[:n_fields], tuple(values[n_fields:])
+                fields[terr_idx] = fields[terr_idx] == "True"
+                self._entries[key] = (tuple(fields), derived, (int(counter), rec_id))
+        except Exception as e:
+            logging.warning("Cannot read %s: %s", self.path, e)
+            self._entries = {}
+
+    def line_key(self, text: str) -> str:
+        norm = " ".join(text.split())
+        return hashlib.md5(f"{self.version}|{norm}".encode("utf-8")).hexdigest()
+
+    def parse(self, texts):
+        """
+        Разбор строк с учётом кэша → (кортежи как у parse_batch, [(counter, ID) | None]).
+        """
+        self._keys = [self.line_key(t) for t in texts]
+        parsed, ids, missed = [], [], []
+        self._derived = []
+        for i, (key, text) in enumerate(zip(self._keys, texts)):
+            entry = self._entries.get(key)
+            if entry is None:
+                missed.append(i)
+                parsed.append(None)
+                ids.append(None)
+                self._derived.append(None)
+            else:
+                # исходный текст в кэше не храним — он нормализуется в «Изначальный текст»
+                parsed.append(entry[0] + (" ".join(text.split()),))
+                ids.append(entry[2])
+                self._derived.append(entry[1])
+
+        for i, row in zip(missed, self.section.parse_batch([texts[i] for i in missed])):
+            parsed[i] = row
+
+        self.hits, self.misses = len(texts) - len(missed), len(missed)
+        logging.info("RFM parse cache (%s): %d hits, %d misses",
+                     self.section.section_id, self.hits, self.misses)
+        return parsed, ids
+
+    def update(self, parsed_rows, ids) -> None:
+        """
+        Запоминает только строки текущего списка, так что кэш не растёт.
+        """
+        n_fields = len(self.fields)
+        self._entries = {
+            key: (tuple(row[:n_fields]), derived, rec_id)
+            for key, row, derived, rec_id in zip(self._keys, parsed_rows, self._derived, ids)
+        }
+
+    def add_derived(self, df: pd.DataFrame) -> None:
+        """
+        Производные колонки (section.derived) в `df` — строках последнего
+        parse: из кэша, а для строк не из кэша — функциями section.derived.
+        """
+        values = list(self._derived)
+        missed = [i for i, v in enumerate(values) if v is None]
+        if missed:
+            part = df.iloc[missed].copy()
+            for column, derive in self.section.derived.items():
+                part[column] = derive(part)
+            for i, row in zip(missed, part[self.derived].itertuples(index=False)):
+                values[i] = tuple(row)
+        for k, column in enumerate(self.derived):
+            df[column] = [v[k] for v in values]
+        self._derived = values
+        for key, derived in zip(self._keys, values):
+            fields, _, rec_id = self._entries[key]
+            self._entries[key] = (fields, derived, rec_id)
+
+    def save(self) -> None:
+        rows = [
+            [key, *fields, *derived, counter, rec_id]
+            for key, (fields, derived, (counter, rec_id)) in self._entries.items()
+        ]
+        tmp = self.path.with_suffix(".tmp")
+        pd.DataFrame(rows, columns=self.columns).to_csv(tmp, index=False, encoding="utf-8")
+        tmp.replace(self.path)
+
+# ─────────────────────────────────────────────────────────────────────────────
+def load_fetch_state() -> dict:
+    """
+    Состояние прошлой загрузки: ETag, Last-Modified и хэши секций.
+    """
+    try:
+        with open(FETCH_STATE_FILE, encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logging.warning("Cannot read %s: %s", FETCH_STATE_FILE, e)
+        return {}
+
+    # формат до появления нескольких секций
+    if "section_hash" in state:
+        state.setdefault("section_hashes", {})[RFM_SECTION_ID] = state.pop("section_hash")
+    return state
+
+
+def save_fetch_state(state: dict) -> None:
+    tmp = FETCH_STATE_FILE.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    tmp.replace(FETCH_STATE_FILE)
+
+
+def _section_hash(texts) -> str:
+    h = hashlib.sha256()
+    for text in texts:
+        h.update(text.encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+# ─────────────────────────────────────────────────────────────────────────────
+def _request_rfm_page(stream: bool, state=None) -> requests.Response:
+    headers = {"User-Agent": "Mozilla/5.0"}
+    if state:
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+
     resp = requests.get(
         PARSE_URL,
-        headers={"User-Agent": "Mozilla/5.0"},
+        headers=headers,
         timeout=60,
         verify=False,        # сайт с самоподписанным сертификатом
+        stream=stream,
     )
     resp.raise_for_status()
+    return resp
 
-    soup = BeautifulSoup(resp.text, "html.parser")
-    section = soup.select_one("#russianFL")
-    if not section:
-        raise ValueError("Секция #russianFL не найдена")
 
-    persons = section.find_all("li")
-    data, id_counter = [], {}
-    for idx, li in enumerate(persons, 1):
-        parsed = _parse_person_text(li.get_text(strip=True))
-        n, name, alias, dob, other, terr, raw = parsed
+def _iter_response_text(resp: requests.Response):
+    # resp.text при отсутствии charset угадывает кодировку по всему телу,
+    # в потоке это невозможно — сайт отдаёт utf-8
+    if resp.encoding is None:
+        resp.encoding = "utf-8"
+    return resp.iter_content(chunk_size=STREAM_CHUNK_SIZE, decode_unicode=True)
 
-        key = (name.lower(), dob)
-        id_counter[key] = id_counter.get(key, 0) + 1
-        rec_id = generate_record_id(name, dob, id_counter[key] - 1)
-        data.append([rec_id, n, name, alias, dob, other, terr, raw])
 
-        if idx % 100 == 0:
-            logging.info("RFM-парсер: обработано %d человек…", idx)
-
-    df = pd.DataFrame(
-        data,
-        columns=[
-            "ID",
-            "Порядковый номер",
-            "Имя",
-            "Доп Имя",
-            "Дата рождения",
-            "Остальные данные",
-            "Террорист",
-            "Изначальный текст",
-        ],
-    )
-    logging.info("RFM-парсер: всего %d записей", len(df))
-    return df
+def fetch_rfm_sections(section_ids=(RFM_SECTION_ID,), stream: bool = True, state=None, use_cache: bool = True):
+# def fetch_rfm_sections(...) -> Dict[str, pd.DataFrame]:
+    """
+    Одна загрузка и один проход по странице РФМ для всех секций из
+    `section_ids` (см. SECTIONS) → {id секции: DataFrame с section.columns
+    и section.derived}.
+    :param stream:  разбирать ответ по мере получения и прекращать чтение
+                    после закрытия последней секции (по умолчанию); False —
+                    прежний режим через полный BeautifulSoup-разбор страницы
+    :param state:   состояние прошлой загрузки (см. load_fetch_state).
+                    Если передано — запрос условный, и если ни одна секция
+                    не изменилась, возвращается {} без разбора. Словарь
+                    обновляется на месте, сохранять его (save_fetch_state) —
+                    забота вызывающего.
+    :param use_cache: разбирать только новые/изменённые строки (ParseCache)
+    """
+    unknown = [sid for sid in section_ids if sid not in SECTIONS]
+    if unknown:
+        raise ValueError(f"Unknown RFM section ids: {', '.join(unknown)} (known: {', '.join(SECTIONS)})")
+    sections = [SECTIONS[sid] for sid in section_ids]
+    required = [s.section_id for s in sections if s.required]
+
+    logging.info("Fetching RFM list (%s)…", ", ".join(section_ids))
+    resp = _request_rfm_page(stream, state)
+
+    texts = {}
+    with resp:
+        if resp.status_code == 304:
+            logging.info("RFM page not modified (HTTP 304)")
+            return {}
+
+        if stream:
+            found = []
+            items = iter_sections_items(_iter_response_text(resp), section_ids, required, found)
+            for section_id, text in items:
+                texts.setdefault(section_id, []).append(text)
+            for section_id in found:
+                texts.setdefault(section_id, [])
+        else:
+            soup = BeautifulSoup(resp.text, "html.parser")
+            for section_id in section_ids:
+                section = soup.select_one(f"#{section_id}")
+                if not section:
+                    if section_id in required:
+                        raise ValueError(f"Секция #{section_id} не найдена")
+                    logging.warning("Секция #%s не найдена", section_id)
+                    continue
+                texts[section_id] = [li.get_text(strip=True) for li in section.find_all("li")]
+
+    if state is not None:
+        hashes = {sid: _section_hash(items) for sid, items in texts.items()}
+        old_hashes = state.get("section_hashes", {})
+        unchanged = all(old_hashes.get(sid) == h for sid, h in hashes.items())
+        state.update(
+            etag=resp.headers.get("ETag"),
+            last_modified=resp.headers.get("Last-Modified"),
+            section_hashes={**old_hashes, **hashes},
+        )
+        if unchanged:
+            logging.info("RFM sections not changed (%s)", ", ".join(section_ids))
+            return {}
+
+    # ненайденные необязательные секции в результат не попадают
+    result = {}
+    for section in sections:
+        if section.section_id not in texts:
+            continue
+        cache = ParseCache(section) if use_cache else None
+        df = pd.DataFrame(iter_section_rows(section, texts[section.section_id], cache), columns=section.columns)
+        if cache is not None:
+            cache.add_derived(df)
+            cache.save()
+        else:
+            for column, derive in section.derived.items():
+                df[column] = derive(df)
+        logging.info("RFM-парсер (%s): всего %d записей", section.section_id, len(df))
+        result[section.section_id] = df
+    return result
+
+
+def fetch_rfm_list(stream: bool = True, state=None, use_cache: bool = True):
+# def fetch_rfm_list(stream: bool = True, state: dict | None = None, use_cache: bool = True) -> pd.DataFrame | None:
+    """
+    Загружает РФМ-список (#russianFL) и возвращает DataFrame с колонками
+    RFM_COLUMNS; None — если при условном запросе (state) секция не изменилась.
+    """
+    return fetch_rfm_sections([RFM_SECTION_ID], stream, state, use_cache).get(RFM_SECTION_ID)
@@ -0,0 +1,266 @@
+"""
+Архив снимков РФМ: периодические полные контрольные точки + дельты между
+запусками (добавленные / удалённые / изменённые строки).
+Любой прошлый снимок восстанавливается загрузкой ближайшей контрольной
+точки и проигрыванием дельт после неё.
+
+Структура каталога ARCHIVE_DIR/<prefix>/:
+    index.csv                          — журнал записей архива
+    head.csv                           — ID → хэш строки последнего снимка
+    checkpoint_<ts>.csv.gz             — полный снимок
+    delta_<ts>.csv.gz                  — колонка «_op» (added/removed/changed/moved) + строки
+"""
+
+from __future__ import annotations
+
+import bisect, csv, logging
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from compare import row_hashes
+from config import ARCHIVE_CHECKPOINT_EVERY, ARCHIVE_DIR
+
+TS_FORMAT = "%Y_%m_%d__%H_%M_%S"
+INDEX_COLUMNS = ["ts", "kind", "file", "rows", "added", "removed", "changed"]
+
+
+def _read_gz(path: Path) -> pd.DataFrame:
+    return pd.read_csv(path, dtype=str, keep_default_na=False, compression="gzip")
+
+
+def _as_strings(df: pd.DataFrame) -> pd.DataFrame:
+    # в архиве всё хранится строками — так же, как и в CSV-снимках
+    return df.fillna("").astype(str)
+
+
+NUMBER_COLUMN = "Порядковый номер"
+TEXT_COLUMN = "Изначальный текст"
+
+
+def _numbered_prefixes(df: pd.DataFrame):
+    """
+    Префиксы «N. » строк, если список пронумерован подряд с 1, иначе None.
+    Тогда номер — производное от позиции: добавление одного человека в
+    середину сдвигает номера у всех следующих, но в дельту они не попадают.
+    """
+    if NUMBER_COLUMN not in df.columns or TEXT_COLUMN not in df.columns:
+        return None
+    numbers = [str(i) for i in range(1, len(df) + 1)]
+    if df[NUMBER_COLUMN].tolist() != numbers:
+        return None
+    prefixes = [f"{n}. " for n in numbers]
+    if not all(map(str.startswith, df[TEXT_COLUMN], prefixes)):
+        return None
+    return prefixes
+
+
+def _strip_numbers(df: pd.DataFrame, prefixes) -> pd.DataFrame:
+    texts = [t[len(p):] for t, p in zip(df[TEXT_COLUMN], prefixes)]
+    return df.drop(columns=NUMBER_COLUMN).assign(**{TEXT_COLUMN: texts})
+
+
+def _out_of_order(positions) -> np.ndarray:
+    """
+    Маска элементов, не входящих в наибольшую возрастающую подпоследовательность
+    `positions` — минимум строк, которые нужно переставить, чтобы остальные
+    сохранили прежний взаимный порядок.
+    """
+    tails, tail_idx, parent = [], [], [-1] * len(positions)
+    for i, p in enumerate(positions):
+        k = bisect.bisect_left(tails, p)
+        if k == len(tails):
+            tails.append(p)
+            tail_idx.append(i)
+        else:
+            tails[k] = p
+            tail_idx[k] = i
+        parent[i] = tail_idx[k - 1] if k else -1
+    mask = np.ones(len(positions), dtype=bool)
+    i = tail_idx[-1] if tail_idx else -1
+    while i >= 0:
+        mask[i] = False
+        i = parent[i]
+    return mask
+
+
+def _renumber(df: pd.DataFrame, columns) -> pd.DataFrame:
+    numbers = [str(i) for i in range(1, len(df) + 1)]
+    texts = [f"{n}. {t}" for n, t in zip(numbers, df[TEXT_COLUMN])]
+    return df.assign(**{NUMBER_COLUMN: numbers, TEXT_COLUMN: texts})[list(columns)].reset_index(drop=True)
+
+
+class SnapshotArchive:
+    """
+    Архив снимков одной секции (prefix — RfmSection.file_prefix).
+
+    Контрольная точка хранит снимок как есть. Дельта пишется, только если
+    и предыдущий, и новый снимок пронумерованы подряд (см. _numbered_prefixes):
+    строки в ней хранятся без номера, с позицией «_pos» в новом снимке,
+    а при восстановлении номера расставляются заново по позициям.
+    Неизменённые строки, которые поменяли взаимный порядок, попадают в
+    дельту как «moved» (с позицией), остальные при восстановлении
+    сохраняют прежний порядок.
+    """
+
+    def __init__(self, prefix: str = "data", root: Path = ARCHIVE_DIR,
+                 checkpoint_every: int = ARCHIVE_CHECKPOINT_EVERY):
+        self.prefix = prefix
+        self.dir = Path(root) / prefix
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.index_file = self.dir / "index.csv"
+        self.head_file = self.dir / "head.csv"
+        self.checkpoint_every = checkpoint_every
+
+    # ---------- чтение ----------
+    def entries(self) -> pd.DataFrame:
+        if not self.index_file.exists():
+            return pd.DataFrame(columns=INDEX_COLUMNS)
+        return pd.read_csv(self.index_file, dtype=str, keep_default_na=False)
+
+    def timestamps(self):
+        return [datetime.strptime(ts, TS_FORMAT) for ts in self.entries()["ts"]]
+
+    def reconstruct(self, ts: datetime = None) -> pd.DataFrame | None:
+        """
+        Снимок на момент `ts` (последняя запись архива не позже ts;
+        None — самая последняя).
+        """
+        entries = self.entries()
+        if ts is not None:
+            entries = entries[entries["ts"] <= ts.strftime(TS_FORMAT)]
+        checkpoints = entries.index[entries["kind"] == "checkpoint"]
+        if not len(checkpoints):
+            return None
+
+        start = checkpoints[-1]
+        snapshot = _read_gz(self.dir / entries.at[start, "file"])
+        deltas = entries.loc[start:].iloc[1:]
+        if not len(deltas):
+            return snapshot
+
+        columns = snapshot.columns
+        state = _strip_numbers(snapshot, _numbered_prefixes(snapshot))
+        for file in deltas["file"]:
+            delta = _read_gz(self.dir / file)
+            op = delta.pop("_op")
+            pos = pd.to_numeric(delta.pop("_pos"), errors="coerce")
+
+            # оставшиеся строки сохраняют взаимный порядок, новые/изменённые
+            # встают на свои позиции
+            kept = state[~state["ID"].isin(delta.loc[op != "added", "ID"])]
+            upserts = delta[op != "removed"].reindex(columns=state.columns, fill_value="")
+            upsert_pos = pos[op != "removed"].astype(int).to_numpy()
+
+            order = pd.Series(range(len(kept) + len(upserts)))
+            slots = order[~order.isin(upsert_pos)].to_numpy()
+            merged = pd.concat([kept, upserts], ignore_index=True)
+            merged.index = list(slots) + list(upsert_pos)
+            state = merged.sort_index()
+
+        return _renumber(state, columns)
+
+    # ---------- запись ----------
+    def append(self, df: pd.DataFrame, ts: datetime) -> Path:
+        """
+        Добавляет снимок в архив: полную контрольную точку, если пора
+        (первая запись, каждые checkpoint_every записей, непоследовательная
+        нумерация или дельта больше половины списка), иначе — дельту
+        относительно предыдущего снимка.
+        """
+        df = _as_strings(df).reset_index(drop=True)
+        prefixes = _numbered_prefixes(df)
+        canonical = _strip_numbers(df, prefixes) if prefixes else df
+        hashes = pd.Series(row_hashes(canonical, [c for c in canonical.columns if c != "ID"]).to_numpy(),
+                           index=df["ID"].to_numpy()).astype(str)
+
+        entries = self.entries()
+        head = self._load_head()
+        since_checkpoint = 0
+        if len(entries):
+            kinds = entries["kind"].tolist()
+            since_checkpoint = len(kinds) - 1 - max(i for i, k in enumerate(kinds) if k == "checkpoint")
+
+        stamp = ts.strftime(TS_FORMAT)
+        added = removed = changed = moved = 0
+        if head is None or prefixes is None or since_checkpoint + 1 >= self.checkpoint_every:
+            kind = "checkpoint"
+        else:
+            prev = head.reindex(hashes.index)
+            is_new = prev.isna().to_numpy()
+            is_changed = ~is_new & (prev.to_numpy() != hashes.to_numpy())
+            gone = head.index[~head.index.isin(hashes.index)]
+            # неизменённые строки должны идти в прежнем порядке — иначе перестановку
+            # не восстановить; переставленные пишутся в дельту как «moved»
+            stayed = np.flatnonzero(~is_new & ~is_changed)
+            old_pos = pd.Series(range(len(head)), index=head.index)
+            is_moved = np.zeros(len(df), dtype=bool)
+            is_moved[stayed[_out_of_order(old_pos.reindex(hashes.index[stayed]).tolist())]] = True
+            added, changed, removed = int(is_new.sum()), int(is_changed.sum()), len(gone)
+            moved = int(is_moved.sum())
+            kind = "delta" if added + changed + removed + moved <= len(df) / 2 else "checkpoint"
+
+        path = self.dir / f"{kind}_{stamp}.csv.gz"
+        if kind == "checkpoint":
+            df.to_csv(path, index=False, encoding="utf-8", compression="gzip")
+        else:
+            upserts = canonical.assign(_pos=range(len(canonical)))
+            delta = pd.concat([
+                upserts[is_new].assign(_op="added"),
+                upserts[is_changed].assign(_op="changed"),
+                upserts[is_moved].assign(_op="moved"),
+                pd.DataFrame({"ID": gone, "_op": "removed"}),
+            ], ignore_index=True).reindex(columns=["_op", "_pos", *canonical.columns], fill_value="")
+            delta.to_csv(path, index=False, encoding="utf-8", compression="gzip")
+
+        # без последовательной нумерации следующая запись — тоже контрольная точка
+        self._save_head(hashes if prefixes else None)
+        self._append_index([stamp, kind, path.name, len(df), added, removed, changed])
+        logging.info("Snapshot archive (%s): %s %s, +%d | -%d | ~%d | moved %d",
+                     self.prefix, kind, path.name, added, removed, changed, moved)
+        return path
+
+    # ---------- внутреннее ----------
+    def _load_head(self) -> pd.Series | None:
+        if not self.head_file.exists():
+            return None
+        head = pd.read_csv(self.head_file, dtype=str, keep_default_na=False)
+        return pd.Series(head["hash"].to_numpy(), index=head["ID"].to_numpy())
+
+    def _save_head(self, hashes) -> None:
+        if hashes is None:
+            self.head_file.unlink(missing_ok=True)
+            return
+        tmp = self.head_file.with_suffix(".tmp")
+        pd.DataFrame({"ID": hashes.index, "hash": hashes.to_numpy()}).to_csv(tmp, index=False)
+        tmp.replace(self.head_file)
+
+    def _append_index(self, row) -> None:
+        new_file = not self.index_file.exists()
+        with open(self.index_file, "a", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            if new_file:
+                writer.writerow(INDEX_COLUMNS)
+            writer.writerow(row)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    # Восстановление снимка из архива:
+    #   $ python snapshot_archive.py 2025_03_01__00_00_00 out.csv [--prefix data]
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Restore RFM snapshot from the delta archive")
+    parser.add_argument("ts", help=f"момент времени в формате {TS_FORMAT}")
+    parser.add_argument("out", help="куда сохранить CSV")
+    parser.add_argument("--prefix", default="data")
+    args = parser.parse_args()
+
+    df = SnapshotArchive(args.prefix).reconstruct(datetime.strptime(args.ts, TS_FORMAT))
+    if df is None:
+        raise SystemExit("В архиве нет снимков до этого момента")
+    df.to_csv(args.out, index=False, encoding="utf-8")
+    logging.info("Restored %d rows → %s", len(df), args.out)
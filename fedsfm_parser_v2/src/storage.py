@@ -1,69 +1,127 @@
 import pandas as pd, logging
 from datetime import datetime
 from pathlib import Path
-from config import DATA_DIR, REPORTS_DIR, SRC_DIR, KEEP_FILES_COUNT, MASTER_FILE
+from config import DATA_DIR, REPORTS_DIR, SRC_DIR, KEEP_FILES_COUNT, SNAPSHOT_FORMAT
+from manifest import Manifest
+from master_log import MasterLog
+from regions import read_region_dict
+
+SNAPSHOT_EXTENSIONS = {"csv": ".csv", "parquet": ".parquet"}
+BOOL_COLUMNS = ["Террорист"]
 
 def get_region_dict():
-    df = pd.read_csv(f"{SRC_DIR}/regions_dict.csv", dtype=str, sep=",")
+    return read_region_dict(SRC_DIR / "regions_dict.csv")
+
+def snapshot_globs(prefix: str = "data"):
+    """Шаблоны файлов снимков секции во всех поддерживаемых форматах."""
+    return [f"{prefix}_*{ext}" for ext in SNAPSHOT_EXTENSIONS.values()]
+
+def has_snapshot(prefix: str = "data") -> bool:
+    return Manifest().latest("snapshot", prefix) is not None
 
-    # Convert to the desired dictionary structure
-    region_dict = {
-        row["id"]: (
-            row["Регион (справочник)"],
-            [variant.strip() for variant in row["Варианты в файле"].split(";") if variant.strip()]
-        )
-        for _, row in df.iterrows()
-    }
+def _with_bool_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    «Террорист» → настоящий bool (в CSV-снимках он хранится строкой "True"/"False").
+    """
+    df = df.copy()
+    for col in BOOL_COLUMNS:
+        if col in df.columns and df[col].dtype != bool:
+            df[col] = df[col].map(lambda v: v is True or v == "True")
+    return df
 
-    return region_dict
+def _require_pyarrow() -> None:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise RuntimeError("Снимки в формате parquet (SNAPSHOT_FORMAT=parquet) требуют pyarrow: pip install pyarrow") from None
 
-def save_dataset(df: pd.DataFrame, ts: datetime) -> Path:
+def save_dataset(df: pd.DataFrame, ts: datetime, prefix: str = "data", fmt: str = None) -> Path:
+    """
+    :param prefix:  префикс файла секции РФМ (RfmSection.file_prefix)
+    :param fmt:     "csv" или "parquet" (по умолчанию SNAPSHOT_FORMAT).
+                    Parquet — колоночный, сжатый (zstd), с типизированным
+                    «Террорист»; требует pyarrow.
+    """
+    fmt = fmt or SNAPSHOT_FORMAT
+    if fmt not in SNAPSHOT_EXTENSIONS:
+        raise ValueError(f"Неизвестный формат снимка {fmt!r}: {', '.join(SNAPSHOT_EXTENSIONS)}")
+    if fmt == "parquet":
+        _require_pyarrow()
     DATA_DIR.mkdir(exist_ok=True, parents=True)
-    path = DATA_DIR / f"data_{ts:%Y_%m_%d__%H_%M_%S}.csv"
+    path = DATA_DIR / f"{prefix}_{ts:%Y_%m_%d__%H_%M_%S}{SNAPSHOT_EXTENSIONS[fmt]}"
     # comment for debug
-    df.to_csv(path, index=False, encoding='utf-8')
+    if fmt == "parquet":
+        _with_bool_columns(df).to_parquet(path, index=False, compression="zstd")
+    else:
+        df.to_csv(path, index=False, encoding='utf-8')
+    Manifest().register(path, rows=len(df))
     return path
 
+def read_snapshot(path: Path, columns=None) -> pd.DataFrame:
+    """
+    Читает снимок любого формата.
+    :param columns:  проекция — читать только эти колонки
+    CSV читается строками (dtype=str), как и раньше; Parquet — с типами.
+    """
+    if Path(path).suffix == SNAPSHOT_EXTENSIONS["parquet"]:
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, dtype=str, usecols=columns)
+
+def export_csv(path: Path) -> Path:
+    """
+    CSV-версия снимка (например, для отправки документом в Telegram).
+    Для CSV-снимка возвращает его же, Parquet выгружается в REPORTS_DIR.
+    """
+    path = Path(path)
+    if path.suffix == SNAPSHOT_EXTENSIONS["csv"]:
+        return path
+    REPORTS_DIR.mkdir(exist_ok=True, parents=True)
+    out = REPORTS_DIR / f"{path.stem}.csv"
+    df = read_snapshot(path)
+    df.to_csv(out, index=False, encoding='utf-8')
+    Manifest().register(out, rows=len(df))
+    return out
+
 def save_report(data: str, ts: datetime) -> Path:
     REPORTS_DIR.mkdir(exist_ok=True, parents=True)
     path = REPORTS_DIR / f"report_{ts:%Y_%m_%d__%H_%M_%S}.txt"
     with open(path, "w", encoding="utf-8") as f:
         f.write(data)
+    Manifest().register(path)
     return path
 
-def load_latest(exclude: str = None):
-# def load_latest(exclude: Path | None = None) -> pd.DataFrame | None:
-    files = sorted(DATA_DIR.glob("data_*.csv"), key=lambda p: p.stat().st_mtime, reverse=True)
-    for f in files:
-        if exclude and f == exclude:
-            continue
+def load_latest(exclude: str = None, prefix: str = "data", columns=None):
+# def load_latest(exclude: Path | None = None, prefix: str = "data", columns: List[str] | None = None) -> pd.DataFrame | None:
+    """
+    Последний читаемый снимок секции (CSV или Parquet) по манифесту —
+    по времени из имени файла, а не по mtime.
+    Нечитаемый файл помечается в манифесте как "invalid" и больше не выбирается.
+    :param columns:  проекция — читать только эти колонки
+    """
+    manifest = Manifest()
+    while True:
+        f = manifest.latest("snapshot", prefix, exclude=exclude)
+        if f is None:
+            return None, None
         try:
-            return pd.read_csv(f, dtype=str), f
+            return read_snapshot(f, columns), f
+        except FileNotFoundError:
+            logging.warning("Snapshot %s is missing – removed from manifest", f)
+            manifest.forget(f)
         except Exception as e:
             logging.warning("Cannot read %s: %s", f, e)
-    return None, None
-
-def update_master(new_df: pd.DataFrame, ts: datetime):
-    if MASTER_FILE.exists():
-        master = pd.read_csv(MASTER_FILE, dtype=str)
-    else:
-        master = pd.DataFrame(columns=list(new_df.columns) + ["Дата добавления","Дата удаления"])
-        
-
-    master_ids = set(master["ID"])
-    new_ids = set(new_df["ID"])
-
-    added = new_ids - master_ids
-    if added:
-        rows = new_df[new_df["ID"].isin(added)].copy()
-        rows["Дата добавления"] = ts.strftime("%Y-%m-%d")
-        rows["Дата удаления"] = ""
-        master = pd.concat([master, rows], ignore_index=True)
+            manifest.mark_invalid(f)
 
-    removed = master_ids - new_ids
-    if removed:
-        mask = master["ID"].isin(removed) & (master["Дата удаления"] == "")
-        master.loc[mask, "Дата удаления"] = ts.strftime("%Y-%m-%d")
+def update_master(new_df: pd.DataFrame, ts: datetime) -> list:
+    """
+    Дописывает в журнал мастер-списка (master_log.MasterLog) добавленные
+    и удалённые ID. Возвращает записанные события.
+    """
+    events = MasterLog().update(new_df, ts)
+    added = sum(e["op"] == "added" for e in events)
+    logging.info("Master log updated: +%d | -%d", added, len(events) - added)
+    return events
 
-    master.to_csv(MASTER_FILE, index=False, encoding='utf-8')
-    logging.info("Master table updated: %s", MASTER_FILE)
+def materialize_master(path: Path = None) -> Path:
+    """Полная таблица мастер-списка (rfm_master.csv) из журнала."""
+    return MasterLog().materialize(path)
@@ -1,4 +1,7 @@
-import re, hashlib
+import os, re, hashlib, unicodedata
+
+# экранируем обе кавычки \' и \", используем двойные кавычки-делимитеры
+_EDGE_PUNCT_RE = re.compile(r"^[\s,;.\'\"“”«»]+|[\s,;.\'\"“”«»]+$")
 
 def clean_field(value: str) -> str:
     """
@@ -6,8 +9,23 @@ def clean_field(value: str) -> str:
     """
     if not isinstance(value, str):
         return value
-    # экранируем обе кавычки \' и \", используем двойные кавычки-делимитеры
-    return re.sub(r"^[\s,;.\'\"“”«»]+|[\s,;.\'\"“”«»]+$", "", value.strip())
+    return _EDGE_PUNCT_RE.sub("", value.strip())
+
+
+_NON_WORD_RE = re.compile(r"[^\w\s]", flags=re.U)
+_SPACES_RE = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """
+    Приводим строку к верхнему регистру + убираем диакритику и лишние пробелы.
+    """
+    if not isinstance(text, str):
+        return ""
+    text = unicodedata.normalize("NFD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _NON_WORD_RE.sub(" ", text)
+    text = _SPACES_RE.sub(" ", text).strip().upper()
+    return text
 
 
 def generate_record_id(name: str, birth_date: str, counter: int = 0) -> str:
@@ -18,3 +36,13 @@ def generate_record_id(name: str, birth_date: str, counter: int = 0) -> str:
 
 def get_file_name(full_path):
     return (str(full_path).split("/"))[-1]
+
+
+def atomic_write(path, text: str) -> None:
+    """Запись через tmp-файл с fsync и replace — файл либо старый, либо новый целиком."""
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    tmp.replace(path)
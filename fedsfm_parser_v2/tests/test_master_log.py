@@ -0,0 +1,70 @@
+"""
+MasterLog: текущее состояние по журналу совпадает с полным проигрыванием,
+даже когда файл состояния перезаписывается не каждый запуск.
+
+    $ python -m pytest tests
+"""
+
+import json, random, sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from master_log import ADDED_COLUMN, REMOVED_COLUMN, MasterLog  # noqa: E402
+
+START = datetime(2025, 1, 1)
+
+
+def _log(tmp_path) -> MasterLog:
+    return MasterLog(tmp_path / "events.jsonl", tmp_path / "view.json", tmp_path / "master.csv")
+
+
+def _frame(ids) -> pd.DataFrame:
+    return pd.DataFrame({"ID": list(ids), "Имя": [f"ЧЕЛОВЕК {i}" for i in ids]})
+
+
+def test_current_matches_replay(tmp_path, monkeypatch):
+    rng = random.Random(0)
+    ids = set(range(200))
+    rewrites = []
+    save_view = MasterLog._save_view
+    monkeypatch.setattr(MasterLog, "_save_view", lambda self, view: (rewrites.append(1), save_view(self, view)))
+    for day in range(60):
+        if day:
+            ids -= set(rng.sample(sorted(ids), 2))
+            ids |= {rng.randrange(400) for _ in range(2)}
+        log = _log(tmp_path)
+        log.update(_frame(sorted(ids)), START + timedelta(days=day))
+
+        replayed = {}
+        for event in log.iter_events():
+            MasterLog._apply(replayed, event)
+        assert _log(tmp_path).current()["rows"] == replayed
+        assert set(replayed) == {str(i) for i in ids}
+    # состояние перезаписывается не на каждый запуск
+    assert len(rewrites) < 30
+
+
+def test_relisted_person_gets_new_period(tmp_path):
+    log = _log(tmp_path)
+    log.update(_frame([1, 2]), START)
+    log.update(_frame([1]), START + timedelta(days=1))
+    log.update(_frame([1, 2]), START + timedelta(days=2))
+
+    table = pd.read_csv(log.materialize(tmp_path / "out.csv"), dtype=str, keep_default_na=False)
+    periods = table[table["ID"] == "2"][[ADDED_COLUMN, REMOVED_COLUMN]].values.tolist()
+    assert periods == [["2025-01-01", "2025-01-02"], ["2025-01-03", ""]]
+
+
+def test_legacy_table_is_moved_after_import(tmp_path):
+    legacy = pd.DataFrame({"ID": ["1"], "Имя": ["ЧЕЛОВЕК 1"], ADDED_COLUMN: ["2024-01-01"], REMOVED_COLUMN: [""]})
+    legacy.to_csv(tmp_path / "master.csv", index=False)
+    log = _log(tmp_path)
+
+    assert set(log.current()["rows"]) == {"1"}
+    assert not (tmp_path / "master.csv").exists()
+    assert (tmp_path / "master.imported.csv").exists()
+    assert json.loads(log.events_file.read_text(encoding="utf-8").splitlines()[0])["ID"] == "1"
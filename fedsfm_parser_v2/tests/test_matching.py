@@ -0,0 +1,50 @@
+"""
+Блокировка полного сравнения (MatchIndex.full_candidates) на синтетических
+данных bench/synth.py с известными парами: не теряет ни одного «full»,
+которое находит перебор (check_recall), и находит заложенные пары.
+
+    $ python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "bench"))
+
+import synth  # noqa: E402
+from compare_airtable import MatchIndex, compare_all_mapped  # noqa: E402
+
+N = 400            # check_recall перебирает все пары выборки
+N_FULL = 2000      # на этом размере (seed 1) DOB-блок без общего токена ФИО давал ложное «full»
+
+
+class _NullQueue:
+    def send_message(self, *args, **kwargs):
+        pass
+
+
+def _sample(n: int, seed: int):
+    people = synth.persons(n, seed)
+    rfm_df = synth.rfm_frame(synth.rfm_lines(people, seed))
+    air_df, truth = synth.airtable_frame(people, n, seed)
+    return rfm_df, air_df, truth
+
+
+def test_blocking_recall_equals_brute_force():
+    rfm_df, air_df, _ = _sample(N, 1)
+    index = MatchIndex(air_df)
+    brute, blocked, size = index.check_recall(index.prepare(rfm_df), sample=N)
+    assert size == N
+    assert brute > 0
+    assert blocked / brute == 1.0
+
+
+def test_full_matches_hit_planted_pairs():
+    rfm_df, air_df, truth = _sample(N_FULL, 1)
+    expected = {(rfm_df["ID"].iat[key], air_id) for air_id, key in truth.items()}
+    found = {(m["ID"], m["_air_id"]) for m in compare_all_mapped(rfm_df, air_df, [], tq=_NullQueue())}
+    assert found
+    # «full» — только заложенные пары: у незаложенных пар в synth нет общего ФИО и ДР
+    assert found <= expected
@@ -0,0 +1,39 @@
+"""
+Эталонный разбор строк РФМ: parse_batch на сохранённом корпусе
+(data/rfm_parse_golden.jsonl) даёт те же кортежи, что прежний разбор.
+
+Корпус — по записи JSON на строку: {"line": строка, "expected": кортеж}.
+Строки: синтетические из bench/synth.py, крайние случаи (без номера, без ДР,
+ДР внутри скобок, несколько псевдонимов, переводы строк, неразрывные пробелы) и случайные
+сочетания фрагментов. Ожидаемые значения получены прежним разбором (до
+parse_batch) и при изменении разбора правятся только осознанно.
+
+    $ python -m pytest tests
+"""
+
+import json, sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from rfm_parser import parse_batch  # noqa: E402
+
+GOLDEN_FILE = Path(__file__).resolve().parent / "data" / "rfm_parse_golden.jsonl"
+
+
+def _load_golden():
+    with open(GOLDEN_FILE, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+GOLDEN = _load_golden()
+
+
+def test_parse_batch_matches_golden():
+    lines = [case["line"] for case in GOLDEN]
+    got = parse_batch(lines)
+    mismatches = [(case["line"], case["expected"], list(row))
+                  for case, row in zip(GOLDEN, got) if list(row) != case["expected"]]
+    assert len(got) == len(lines)
+    assert not mismatches, f"{len(mismatches)} mismatches, first: {mismatches[0]!r}"
+
@@ -0,0 +1,72 @@
+"""
+SnapshotArchive: любой снимок, записанный в архив дельтой, восстанавливается
+тем же, включая порядок строк и нумерацию.
+
+    $ python -m pytest tests
+"""
+
+import random, sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from snapshot_archive import SnapshotArchive  # noqa: E402
+
+START = datetime(2025, 1, 1)
+
+
+def _snapshot(people) -> pd.DataFrame:
+    """Пронумерованный подряд снимок из [(ID, текст без номера)]."""
+    return pd.DataFrame({
+        "ID": [id_ for id_, _ in people],
+        "Порядковый номер": [str(n) for n in range(1, len(people) + 1)],
+        "Имя": [text.split(",")[0] for _, text in people],
+        "Изначальный текст": [f"{n}. {text}" for n, (_, text) in enumerate(people, 1)],
+    })
+
+
+def _people(n: int):
+    return [(f"id{k}", f"ЧЕЛОВЕК {k}, {k:02d}.01.1980 г.р.") for k in range(n)]
+
+
+def test_reorder_only_day(tmp_path):
+    archive = SnapshotArchive(root=tmp_path, checkpoint_every=30)
+    people = _people(40)
+    archive.append(_snapshot(people), START)
+    people[5], people[30] = people[30], people[5]
+    day2 = _snapshot(people)
+    archive.append(day2, START + timedelta(days=1))
+
+    assert archive.entries()["kind"].tolist() == ["checkpoint", "delta"]
+    pd.testing.assert_frame_equal(archive.reconstruct(START + timedelta(days=1)), day2)
+
+
+def test_random_days_reconstruct(tmp_path):
+    rng = random.Random(0)
+    archive = SnapshotArchive(root=tmp_path, checkpoint_every=30)
+    people = _people(60)
+    next_id = len(people)
+    days = []
+    for day in range(20):
+        if day:
+            for _ in range(rng.randint(0, 3)):          # удалены
+                people.pop(rng.randrange(len(people)))
+            for _ in range(rng.randint(0, 3)):          # добавлены в случайное место
+                people.insert(rng.randrange(len(people) + 1), (f"id{next_id}", f"НОВЫЙ {next_id}"))
+                next_id += 1
+            for _ in range(rng.randint(0, 2)):          # изменены
+                k = rng.randrange(len(people))
+                people[k] = (people[k][0], people[k][1] + ", ИЗМ.")
+            for _ in range(rng.randint(0, 3)):          # переставлены
+                i, j = rng.randrange(len(people)), rng.randrange(len(people))
+                people[i], people[j] = people[j], people[i]
+        ts = START + timedelta(days=day)
+        days.append((ts, _snapshot(people)))
+        archive.append(days[-1][1], ts)
+
+    assert "delta" in archive.entries()["kind"].tolist()
+    for ts, df in days:
+        pd.testing.assert_frame_equal(archive.reconstruct(ts), df)